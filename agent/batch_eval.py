@@ -0,0 +1,162 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from referee.game.player import PlayerColor
+from referee.game.pieces import BOARD_N
+from referee.game.constants import MAX_TURNS
+from .board import BAD_LINE
+from .placements import CELL_N, PIECE_CELLS, PLACEMENT_MASKS, CELL_PLACEMENTS
+
+# A new piece overlaps at most this many placements, so an opponent with
+# more moves than this keeps one after any piece that clears no line
+MAX_OVERLAPPED = PIECE_CELLS * max(len(pids) for pids in CELL_PLACEMENTS)
+
+# NumPy is optional, without it the search evaluates children one by one
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+
+def mask_grid(mask: int):
+    """
+    Returns the 11x11 uint8 grid of the cells in a bitmask.
+    """
+
+    data = np.frombuffer(mask.to_bytes((CELL_N + 7) // 8, "little"), dtype=np.uint8)
+    bits = np.unpackbits(data, bitorder="little")[:CELL_N]
+    return bits.reshape(BOARD_N, BOARD_N)
+
+
+if HAVE_NUMPY:
+    # PLACEMENT_GRIDS[pid] is the 11x11 grid of the cells of placement pid
+    PLACEMENT_GRIDS = np.stack([mask_grid(mask) for mask in PLACEMENT_MASKS])
+
+    # The same, flattened to one column per placement for matrix products
+    PLACEMENT_COLUMNS = PLACEMENT_GRIDS.reshape(-1, CELL_N).T.astype(np.float32)
+else:
+    PLACEMENT_GRIDS = None
+    PLACEMENT_COLUMNS = None
+
+
+def neighbours(cells):
+    """
+    For a batch of (N, 11, 11) boolean grids, the cells adjacent to any of
+    the given cells on the torus.
+    """
+
+    return (np.roll(cells, 1, axis=1) | np.roll(cells, -1, axis=1)
+            | np.roll(cells, 1, axis=2) | np.roll(cells, -1, axis=2))
+
+
+def frontier_sizes(cells, occupied):
+    """
+    For a batch of (N, 11, 11) boolean grids, the number of empty cells
+    adjacent to the given cells.
+
+    Returns an int array of length N.
+    """
+
+    return (neighbours(cells) & ~occupied).sum(axis=(1, 2))
+
+
+def legal_placements(own, occupied):
+    """
+    For each of a batch of boards, given as (N, 11, 11) boolean grids of
+    the cells of the player to move and of all occupied cells, which
+    placements that player can legally make.
+
+    Returns an (N, P) boolean array over PLACEMENT_COLUMNS, where P is the
+    number of placements.
+    """
+
+    # free cells next to one of the player's cells, on the torus
+    reach = neighbours(own) & ~occupied
+
+    # a placement with no occupied cell scores the number of reachable
+    # cells it covers, one with an occupied cell scores below zero
+    n = len(own)
+    weights = (reach.reshape(n, CELL_N).astype(np.float32)
+               - PIECE_CELLS * occupied.reshape(n, CELL_N))
+    return (weights @ PLACEMENT_COLUMNS) > 0
+
+
+def eval_children(red, blue, placements, color: PlayerColor, turn_count: int):
+    """
+    Evaluate every child of a position at once. The position is given as
+    11x11 uint8 grids of the red and blue cells, the player to move and the
+    number of turns played, and the children as an (N, 11, 11) array of
+    the cells of each candidate placement of that player.
+
+    Returns an int array of the N child evals, equal to `eval` of each
+    child (from RED's point of view), including line clears and wins.
+    """
+
+    from .program import WINNING_SCORE, MATERIAL_WEIGHT, MOBILITY_WEIGHT
+
+    placed = placements.astype(bool)
+    parent_red = red.astype(bool)
+    parent_blue = blue.astype(bool)
+    red = np.broadcast_to(parent_red, placed.shape)
+    blue = np.broadcast_to(parent_blue, placed.shape)
+    if color == PlayerColor.RED:
+        red = red | placed
+    else:
+        blue = blue | placed
+
+    # clear every full row and column of each child
+    occupied = red | blue
+    full_rows = occupied.all(axis=2)
+    full_cols = occupied.all(axis=1)
+    kept = ~(full_rows[:, :, None] | full_cols[:, None, :])
+    cleared = full_rows.any(axis=1) | full_cols.any(axis=1)
+    red = red & kept
+    blue = blue & kept
+
+    red_rows = red.sum(axis=2)
+    red_cols = red.sum(axis=1)
+    blue_rows = blue.sum(axis=2)
+    blue_cols = blue.sum(axis=1)
+
+    red_count = red_rows.sum(axis=1)
+    blue_count = blue_rows.sum(axis=1)
+    bad_red_lines = (red_rows >= BAD_LINE).sum(axis=1) + (red_cols >= BAD_LINE).sum(axis=1)
+    bad_blue_lines = (blue_rows >= BAD_LINE).sum(axis=1) + (blue_cols >= BAD_LINE).sum(axis=1)
+
+    material = red_count - blue_count - (bad_red_lines - bad_blue_lines)
+    occupied = red | blue
+    mobility = frontier_sizes(red, occupied) - frontier_sizes(blue, occupied)
+    scores = MATERIAL_WEIGHT * material + MOBILITY_WEIGHT * mobility
+
+    child_turn = turn_count + 1
+    if child_turn >= MAX_TURNS:
+        # the player with the most tokens wins, a draw keeps the formula
+        balance = red_count - blue_count
+        scores = np.where(balance > 0, WINNING_SCORE,
+                          np.where(balance < 0, -WINNING_SCORE, scores))
+
+    elif child_turn >= 2:
+        # the opponent loses if they cannot place any piece
+        stuck = np.zeros(len(placed), dtype=bool)
+
+        # without a line clear, the opponent keeps each of their current
+        # moves that the new piece does not overlap
+        parent_own = parent_blue if color == PlayerColor.RED else parent_red
+        opponent_moves = PLACEMENT_COLUMNS[:, legal_placements(
+            parent_own[None], (parent_red | parent_blue)[None])[0]]
+        clean = ~cleared
+        if opponent_moves.shape[1] <= MAX_OVERLAPPED and clean.any():
+            overlaps = placed[clean].reshape(-1, CELL_N).astype(np.float32) @ opponent_moves
+            stuck[clean] = (overlaps > 0).all(axis=1)
+
+        # a line clear can also remove the cells their moves had to touch
+        if cleared.any():
+            own = blue[cleared] if color == PlayerColor.RED else red[cleared]
+            stuck[cleared] = ~legal_placements(
+                own, red[cleared] | blue[cleared]).any(axis=1)
+
+        scores = np.where(stuck, int(color) * WINNING_SCORE, scores)
+
+    return scores
@@ -0,0 +1,426 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from referee.game.coord import Coord
+from referee.game.player import PlayerColor
+from referee.game.actions import Action, PlaceAction
+from referee.game.constants import *
+from referee.game.pieces import *
+from .placements import *
+from .zobrist import *
+from .board import BAD_LINE
+
+
+@dataclass(frozen=True, slots=True)
+class BitUndoRecord:
+    """
+    The changes made to a BitBoard by one `apply_action`, as bitmasks,
+    holding everything `undo_action` needs to restore the prior state.
+    """
+    placed: int
+    cleared_red: int
+    cleared_blue: int
+    key: int
+    balance: int
+    bad_lines: tuple[int, int]
+
+
+def bad_line_count(cells: int) -> int:
+    """
+    Number of rows and columns holding at least BAD_LINE of the given cells.
+    """
+
+    return sum((cells & line).bit_count() >= BAD_LINE for line in LINE_MASKS)
+
+
+class BitBoard:
+    """
+    A drop-in alternative to `Board` that stores each player's cells as a
+    121-bit integer instead of a set of Coords.
+
+    """
+
+    def __init__(
+        self,
+        red: int = 0,
+        blue: int = 0,
+        initial_player: PlayerColor = PlayerColor.RED,
+
+        turn_count=0,
+        key: int = None,
+        balance: int = None,
+        bad_lines: list[int] = None,
+    ):
+        """
+        Create a new board. It is optionally possible to specify an initial
+        board state as bitmasks (in practice this is only used for testing).
+        """
+        self.red = red
+        self.blue = blue
+
+        # Colour of the player that will play next
+        self.turn_color: PlayerColor = initial_player
+
+        # Number of turns that have been played,
+        # which is 1 less than the turn number
+        self.turn_count = turn_count
+
+        # Zobrist key of the position, kept up to date by apply_action
+        if key is None:
+            key = zobrist_key(red, blue, initial_player)
+        self.key = key
+
+        # Red tokens minus blue tokens, and the number of lines holding at
+        # least BAD_LINE cells of each colour indexed by PlayerColor, kept
+        # up to date by apply_action for the eval
+        if balance is None or bad_lines is None:
+            balance = red.bit_count() - blue.bit_count()
+            bad_lines = [bad_line_count(red), bad_line_count(blue)]
+        self.balance = balance
+        self.bad_lines = bad_lines
+
+        # Cached result of terminal_status, None until asked for
+        self._status: tuple[bool, PlayerColor | None] | None = None
+
+    def __eq__(self, other: 'BitBoard'):
+        return self.__hash__() == other.__hash__()
+
+    def __hash__(self):
+        return self.key
+
+    def __copy__(self) -> 'BitBoard':
+        return BitBoard(self.red, self.blue, self.turn_color, self.turn_count, self.key,
+                        self.balance, self.bad_lines.copy())
+
+    def __lt__(self, other: 'BitBoard'):
+        return self.__hash__() < other.__hash__()
+
+    @property
+    def red_cells(self) -> set[Coord]:
+        return mask_to_cells(self.red)
+
+    @property
+    def blue_cells(self) -> set[Coord]:
+        return mask_to_cells(self.blue)
+
+    def apply_action(self, action: Action) -> BitUndoRecord:
+        """
+        Apply an action to a board, mutating the board state.
+        Action should be guaranteed to be legal
+
+        Returns a BitUndoRecord that can be passed to `undo_action`.
+        """
+
+        self._status = None
+        prev_key = self.key
+        prev_balance = self.balance
+        prev_bad_lines = tuple(self.bad_lines)
+
+        # add action to board
+        color = self.turn_color
+        placed = action_mask(action)
+        if color == PlayerColor.RED:
+            self.red |= placed
+            my_cells = self.red
+        else:
+            self.blue |= placed
+            my_cells = self.blue
+        self.key ^= mask_key(placed, color)
+
+        # only the lines crossed by the piece can become bad
+        for line in PLACEMENT_LINES[PLACEMENT_IDS[placed]]:
+            count = (my_cells & line).bit_count()
+            if count >= BAD_LINE > count - (placed & line).bit_count():
+                self.bad_lines[color] += 1
+        self.balance += int(color) * placed.bit_count()
+
+        cleared_red, cleared_blue = self.line_removal(action)
+
+        self.turn_color = self.turn_color.opponent
+        self.turn_count += 1
+        self.key ^= ZOBRIST_TURN
+
+        return BitUndoRecord(placed, cleared_red, cleared_blue, prev_key,
+                             prev_balance, prev_bad_lines)
+
+    def undo_action(self, record: BitUndoRecord):
+        """
+        Undo an action given the BitUndoRecord returned when it was applied,
+        mutating the board state back to exactly what it was before.
+        """
+
+        self._status = None
+        self.turn_color = self.turn_color.opponent
+        self.turn_count -= 1
+        self.key = record.key
+
+        self.red |= record.cleared_red
+        self.blue |= record.cleared_blue
+        if self.turn_color == PlayerColor.RED:
+            self.red &= ~record.placed
+        else:
+            self.blue &= ~record.placed
+
+        self.balance = record.balance
+        self.bad_lines[:] = record.bad_lines
+
+    def line_removal(self, action) -> tuple[int, int]:
+        """
+        Checks if any rows or columns should be removed on the board
+        with the line-removal mechanic
+
+        Returns the bitmasks of the red and blue cells that were removed.
+        """
+
+        if action == None:
+            return (0, 0)
+
+        occupied = self.red | self.blue
+        to_remove = 0
+
+        for cell in action.coords:
+            row = ROW_MASKS[cell.r]
+            if occupied & row == row:
+                to_remove |= row
+
+            col = COL_MASKS[cell.c]
+            if occupied & col == col:
+                to_remove |= col
+
+        if not to_remove:
+            return (0, 0)
+
+        cleared_red = self.red & to_remove
+        cleared_blue = self.blue & to_remove
+        self.key ^= mask_key(cleared_red, PlayerColor.RED)
+        self.key ^= mask_key(cleared_blue, PlayerColor.BLUE)
+        self.red &= ~to_remove
+        self.blue &= ~to_remove
+
+        # a cleared line takes a cell from every line crossing it
+        self.balance -= cleared_red.bit_count() - cleared_blue.bit_count()
+        self.bad_lines[:] = (bad_line_count(self.red), bad_line_count(self.blue))
+
+        return (cleared_red, cleared_blue)
+
+    def generate_all_moves(self) -> list[PlaceAction]:
+        """
+        Generate all possible moves for the current board.
+
+        Returns a list of unique PlaceAction representing valid moves that
+        can be made.
+        """
+
+        if self.turn_color == PlayerColor.RED:
+            my_cells = self.red
+            opponent_cells = self.blue
+        else:
+            my_cells = self.blue
+            opponent_cells = self.red
+        occupied = my_cells | opponent_cells
+
+        # First red move
+        if self.turn_count == 0:
+            return [PLACEMENT_ACTIONS[pid] for pid in ORIGIN_PLACEMENTS]
+
+        # First blue move, kept away from the opponent's first piece
+        elif self.turn_count == 1:
+            blocked = occupied | frontier(opponent_cells, occupied)
+            return [
+                PLACEMENT_ACTIONS[pid]
+                for pid, mask in enumerate(PLACEMENT_MASKS)
+                if not mask & blocked
+            ]
+
+        # Turn 3 onwards
+        else:
+            return [
+                PLACEMENT_ACTIONS[pid]
+                for pid in iter_placement_ids(my_cells, opponent_cells, self.turn_count)
+            ]
+
+    def iter_clearing_ids(self, color: PlayerColor) -> Iterator[int]:
+        """
+        Generate the placement id of every move of the given player that
+        would complete a row or column.
+        """
+
+        if color == PlayerColor.RED:
+            return iter_clearing_ids(self.red, self.blue)
+        return iter_clearing_ids(self.blue, self.red)
+
+    def iter_move_ids(self, color: PlayerColor) -> Iterator[int]:
+        """
+        Generate the placement id of every move the given player could
+        make on the current board, without building PlaceActions.
+        """
+
+        if color == PlayerColor.RED:
+            return iter_placement_ids(self.red, self.blue, self.turn_count)
+        return iter_placement_ids(self.blue, self.red, self.turn_count)
+
+    def count_moves(self, color: PlayerColor) -> int:
+        """
+        Number of moves the given player could make on the current board.
+        """
+
+        if color == PlayerColor.RED:
+            return count_placements(self.red, self.blue, self.turn_count)
+        return count_placements(self.blue, self.red, self.turn_count)
+
+    def line_clear_gain(self, action: PlaceAction, color: PlayerColor = None) -> int:
+        """
+        Number of opponent cells that would be removed by the lines the
+        given action completes, without applying it. The action is played
+        by `color`, by default the player to move.
+        """
+
+        occupied = self.red | self.blue | action_mask(action)
+        cleared = 0
+        for cell in (action.c1, action.c2, action.c3, action.c4):
+            row = ROW_MASKS[cell.r]
+            if occupied & row == row:
+                cleared |= row
+
+            col = COL_MASKS[cell.c]
+            if occupied & col == col:
+                cleared |= col
+
+        if not cleared:
+            return 0
+
+        if color is None:
+            color = self.turn_color
+        opponent_cells = self.blue if color == PlayerColor.RED else self.red
+        return (opponent_cells & cleared).bit_count()
+
+    def frontier_sizes(self) -> tuple[int, int]:
+        """
+        Number of empty cells adjacent to each player's cells, i.e. where
+        their next pieces can reach, indexed by PlayerColor.
+        """
+
+        occupied = self.red | self.blue
+        return (frontier(self.red, occupied).bit_count(),
+                frontier(self.blue, occupied).bit_count())
+
+    def token_count(self, color: PlayerColor) -> int:
+        """
+        Number of cells occupied by the given player.
+        """
+
+        cells = self.red if color == PlayerColor.RED else self.blue
+        return cells.bit_count()
+
+    def row_count(self, color: PlayerColor, r: int) -> int:
+        """
+        Number of cells occupied by the given player in row `r`.
+        """
+
+        cells = self.red if color == PlayerColor.RED else self.blue
+        return (cells & ROW_MASKS[r]).bit_count()
+
+    def col_count(self, color: PlayerColor, c: int) -> int:
+        """
+        Number of cells occupied by the given player in column `c`.
+        """
+
+        cells = self.red if color == PlayerColor.RED else self.blue
+        return (cells & COL_MASKS[c]).bit_count()
+
+    def render(self, use_color: bool = False, use_unicode: bool = False) -> str:
+        """
+        Desgined to pretty-print a board.
+
+        Returns a visualisation of the game board as a multiline string, with
+        optional ANSI color codes and Unicode characters (if applicable).
+        """
+        def apply_ansi(str, bold=True, color=None):
+            bold_code = "\033[1m" if bold else ""
+            color_code = ""
+            if color == "r":
+                color_code = "\033[31m"
+            if color == "b":
+                color_code = "\033[34m"
+            return f"{bold_code}{color_code}{str}\033[0m"
+
+        output = ""
+        for r in range(BOARD_N):
+            for c in range(BOARD_N):
+                bit = 1 << (r * BOARD_N + c)
+                if self.red & bit:
+                    color = "r"
+                elif self.blue & bit:
+                    color = "b"
+                else:
+                    output += ". "
+                    continue
+                if use_color:
+                    output += apply_ansi(color, color=color, bold=False)
+                else:
+                    output += color
+                output += " "
+            output += "\n"
+        return output
+
+    def terminal_status(self) -> tuple[bool, PlayerColor | None]:
+        """
+        Whether the game is over and who won it, worked out once and cached
+        until the board next changes.
+
+        Returns a (game over, winner) pair. The winner is None while the
+        game goes on, and after a draw.
+        """
+
+        if self._status is not None:
+            return self._status
+
+        if self.turn_limit_reached:
+            # In this case the player with the most tokens wins, or if equal,
+            # the game ends in a draw.
+            if self.balance == 0:
+                status = (True, None)
+            else:
+                status = (True, PlayerColor.RED if self.balance > 0 else PlayerColor.BLUE)
+
+        elif self.turn_count in [0, 1]:
+            status = (False, None)
+
+        else:
+            my_cells = self.red if self.turn_color == PlayerColor.RED else self.blue
+            occupied = self.red | self.blue
+            if has_legal_move(my_cells, occupied):
+                status = (False, None)
+            else:
+                # Current player cannot place any more pieces. Opponent wins.
+                status = (True, self.turn_color.opponent)
+
+        self._status = status
+        return status
+
+    @property
+    def game_over(self) -> bool:
+        """
+        True iff the game is over.
+        """
+
+        return self.terminal_status()[0]
+
+    @property
+    def winner_color(self) -> PlayerColor | None:
+        """
+        The player (color) who won the game, or None if no player has won.
+        """
+
+        return self.terminal_status()[1]
+
+    @property
+    def turn_limit_reached(self) -> bool:
+        """
+        True iff the maximum number of turns has been reached.
+        """
+
+        return self.turn_count >= MAX_TURNS
@@ -1,16 +1,41 @@
 # COMP30024 Artificial Intelligence, Semester 1 2024
 # Project Part B: Game Playing Agent
 
+from collections.abc import Iterator
+from dataclasses import dataclass
+
 from referee.game.coord import Coord
 from referee.game.player import PlayerColor
 from referee.game.actions import Action, PlaceAction
 from referee.game.constants import *
 from referee.game.pieces import *
+from .placements import *
+from .zobrist import *
 
 import random
 
 PIECE_N = 4
 
+# Avoid placing this many cells on one line if possible
+BAD_LINE = 6
+
+# Shared empty result for actions that clear no lines
+NO_CELLS: frozenset[Coord] = frozenset()
+
+
+@dataclass(frozen=True, slots=True)
+class UndoRecord:
+    """
+    The changes made to a board by one `apply_action`, holding everything
+    `undo_action` needs to restore the prior state.
+    """
+    placed: set[Coord]
+    cleared_red: set[Coord]
+    cleared_blue: set[Coord]
+    key: int
+    balance: int
+    bad_lines: tuple[int, int]
+
 
 class Board:
     """
@@ -20,16 +45,26 @@ class Board:
 
     def __init__(
         self,
-        red_cells: set[Coord] = set(),
-        blue_cells: set[Coord] = set(),
+        red_cells: set[Coord] = None,
+        blue_cells: set[Coord] = None,
         initial_player: PlayerColor = PlayerColor.RED,
 
         turn_count=0,
+        key: int = None,
+        row_counts: list[list[int]] = None,
+        col_counts: list[list[int]] = None,
+        balance: int = None,
+        bad_lines: list[int] = None,
     ):
         """
         Create a new board. It is optionally possible to specify an initial
         board state (in practice this is only used for testing).
         """
+        if red_cells is None:
+            red_cells = set()
+        if blue_cells is None:
+            blue_cells = set()
+
         self.red_cells = red_cells
         self.blue_cells = blue_cells
 
@@ -40,43 +75,132 @@ class Board:
         # which is 1 less than the turn number
         self.turn_count = turn_count
 
+        # Zobrist key of the position, kept up to date by apply_action
+        if key is None:
+            key = zobrist_key(cells_to_mask(red_cells),
+                              cells_to_mask(blue_cells), initial_player)
+        self.key = key
+
+        # Number of cells of each colour in each row and column, indexed by
+        # PlayerColor then line
+        if row_counts is None or col_counts is None:
+            row_counts = [[0] * BOARD_N for _ in PlayerColor]
+            col_counts = [[0] * BOARD_N for _ in PlayerColor]
+            for color, cells in ((PlayerColor.RED, red_cells), (PlayerColor.BLUE, blue_cells)):
+                for cell in cells:
+                    row_counts[color][cell.r] += 1
+                    col_counts[color][cell.c] += 1
+        self.row_counts = row_counts
+        self.col_counts = col_counts
+
+        # Red tokens minus blue tokens, and the number of lines holding at
+        # least BAD_LINE cells of each colour indexed by PlayerColor, kept
+        # up to date by apply_action for the eval
+        if balance is None or bad_lines is None:
+            balance = len(red_cells) - len(blue_cells)
+            bad_lines = [
+                sum(count >= BAD_LINE for count in row_counts[color] + col_counts[color])
+                for color in PlayerColor
+            ]
+        self.balance = balance
+        self.bad_lines = bad_lines
+
+        # Cached result of terminal_status, None until asked for
+        self._status: tuple[bool, PlayerColor | None] | None = None
+
     def __eq__(self, other: 'Board'):
         return self.__hash__() == other.__hash__()
 
     def __hash__(self):
-        return hash((frozenset(self.red_cells), frozenset(self.blue_cells), self.turn_color))
+        return self.key
 
     def __copy__(self) -> 'Board':
-        return Board(self.red_cells.copy(), self.blue_cells.copy(), self.turn_color, self.turn_count)
+        return Board(self.red_cells.copy(), self.blue_cells.copy(), self.turn_color, self.turn_count, self.key,
+                     [counts.copy() for counts in self.row_counts],
+                     [counts.copy() for counts in self.col_counts],
+                     self.balance, self.bad_lines.copy())
 
     def __lt__(self, other: 'Board'):
         return self.__hash__() < other.__hash__()
 
-    def apply_action(self, action: Action):
+    def apply_action(self, action: Action) -> UndoRecord:
         """
         Apply an action to a board, mutating the board state. 
         Action should be guaranteed to be legal
+
+        Returns an UndoRecord that can be passed to `undo_action`.
         """
 
-        # add action to board
-        if self.turn_color == PlayerColor.RED:
-            for cell in action.coords:
-                self.red_cells.add(cell)
-        else:
-            for cell in action.coords:
-                self.blue_cells.add(cell)
+        self._status = None
+        prev_key = self.key
+        prev_balance = self.balance
+        prev_bad_lines = tuple(self.bad_lines)
+        placed = action.coords
 
-        self.line_removal(action)
+        # add action to board
+        color = self.turn_color
+        keys = ZOBRIST_CELLS[color]
+        rows = self.row_counts[color]
+        cols = self.col_counts[color]
+        bad_lines = self.bad_lines
+        my_cells = self.red_cells if color == PlayerColor.RED else self.blue_cells
+        for cell in placed:
+            my_cells.add(cell)
+            self.key ^= keys[cell_index(cell)]
+            rows[cell.r] += 1
+            if rows[cell.r] == BAD_LINE:
+                bad_lines[color] += 1
+            cols[cell.c] += 1
+            if cols[cell.c] == BAD_LINE:
+                bad_lines[color] += 1
+        self.balance += int(color) * len(placed)
+
+        cleared_red, cleared_blue = self.line_removal(action)
 
         self.turn_color = self.turn_color.opponent
         self.turn_count += 1
+        self.key ^= ZOBRIST_TURN
 
-        return
+        return UndoRecord(placed, cleared_red, cleared_blue, prev_key,
+                          prev_balance, prev_bad_lines)
 
-    def line_removal(self, action):
+    def undo_action(self, record: UndoRecord):
+        """
+        Undo an action given the UndoRecord returned when it was applied,
+        mutating the board state back to exactly what it was before.
+        """
+
+        self._status = None
+        self.turn_color = self.turn_color.opponent
+        self.turn_count -= 1
+        self.key = record.key
+
+        for color, cells, cleared in ((PlayerColor.RED, self.red_cells, record.cleared_red),
+                                      (PlayerColor.BLUE, self.blue_cells, record.cleared_blue)):
+            rows = self.row_counts[color]
+            cols = self.col_counts[color]
+            for cell in cleared:
+                cells.add(cell)
+                rows[cell.r] += 1
+                cols[cell.c] += 1
+
+        my_cells = self.red_cells if self.turn_color == PlayerColor.RED else self.blue_cells
+        rows = self.row_counts[self.turn_color]
+        cols = self.col_counts[self.turn_color]
+        for cell in record.placed:
+            my_cells.remove(cell)
+            rows[cell.r] -= 1
+            cols[cell.c] -= 1
+
+        self.balance = record.balance
+        self.bad_lines[:] = record.bad_lines
+
+    def line_removal(self, action) -> tuple[set[Coord], set[Coord]]:
         """
         Checks if any rows or columns should be removed on the board
         with the line-removal mechanic
+
+        Returns the red and blue cells that were removed.
         """
 
         to_remove = set()
@@ -85,20 +209,19 @@ class Board:
         check_col = set()
 
         if action == None:
-            return
+            return (NO_CELLS, NO_CELLS)
 
         for cell in action.coords:
             check_row.add(cell.r)
             check_col.add(cell.c)
 
+        red_rows, blue_rows = self.row_counts
+        red_cols, blue_cols = self.col_counts
+
         # check and remove rows
         for r in check_row:
-            # find entries in the row across the 2 player sets
-            blue_candidate = sum(1 for cell in self.blue_cells if cell.r == r)
-            red_candidate = sum(1 for cell in self.red_cells if cell.r == r)
-
             # if the row is not filled
-            if blue_candidate + red_candidate != BOARD_N:
+            if red_rows[r] + blue_rows[r] != BOARD_N:
                 continue
 
             # otherwise if the row is filled
@@ -106,19 +229,34 @@ class Board:
 
         # check and remove columns
         for c in check_col:
-            # find entries in the col across the 2 player sets
-            blue_candidate = sum(1 for cell in self.blue_cells if cell.c == c)
-            red_candidate = sum(1 for cell in self.red_cells if cell.c == c)
-
             # if the col is not filled
-            if blue_candidate + red_candidate != BOARD_N:
+            if red_cols[c] + blue_cols[c] != BOARD_N:
                 continue
 
             # otherwise if the col is filled
             to_remove.update([Coord(x, c) for x in range(BOARD_N)])
 
-        self.blue_cells = self.blue_cells.difference(to_remove)
-        self.red_cells = self.red_cells.difference(to_remove)
+        if not to_remove:
+            return (NO_CELLS, NO_CELLS)
+
+        removed_cells = []
+        for color, cells in ((PlayerColor.RED, self.red_cells), (PlayerColor.BLUE, self.blue_cells)):
+            removed = cells & to_remove
+            self.key ^= mask_key(cells_to_mask(removed), color)
+            rows = self.row_counts[color]
+            cols = self.col_counts[color]
+            for cell in removed:
+                cells.remove(cell)
+                if rows[cell.r] == BAD_LINE:
+                    self.bad_lines[color] -= 1
+                rows[cell.r] -= 1
+                if cols[cell.c] == BAD_LINE:
+                    self.bad_lines[color] -= 1
+                cols[cell.c] -= 1
+            self.balance -= int(color) * len(removed)
+            removed_cells.append(removed)
+
+        return tuple(removed_cells)
 
     def adjacent(self, coord: Coord):
         """
@@ -129,31 +267,28 @@ class Board:
 
         return [coord.down(), coord.up(), coord.left(), coord.right()]
 
-    def generate_piece_combinations(self, touched_coord) -> set[list[Coord]]:
+    def generate_piece_combinations(self, touched_coord, occupied: int = None) -> set[PlaceAction]:
         """
-        Generate all possible piece combinations touching a given coordinate.
+        Generate all possible piece combinations touching a given coordinate,
+        by filtering the precomputed placement table. `occupied` is the
+        bitmask of all filled cells, computed from the board if not given.
 
-        Returns a set of a list of coordinates, each list represents the
-        coordinates in a PlaceAction.
+        Returns a set of PlaceAction that fit in the empty cells next to the
+        given coordinate.
         """
 
+        if occupied is None:
+            occupied = cells_to_mask(self.red_cells) | cells_to_mask(self.blue_cells)
+
         piece_combinations = set()
-        stack = [(touched_coord, [])]
+        reach = NEIGHBOUR_MASKS[cell_index(touched_coord)] & ~occupied
 
-        while stack:
-            current_coord, current_piece = stack.pop()
-            if len(current_piece) == PIECE_N:
-                piece_combinations.add(tuple(sorted(current_piece)))
-            else:
-                for adjacent_coord in self.adjacent(current_coord):
-                    # check if adj coord is empty and not already in curr piece
-                    if ((adjacent_coord not in self.red_cells) and (adjacent_coord not in self.blue_cells) and
-                            (adjacent_coord not in current_piece)):
-                        stack.append((adjacent_coord, current_piece +
-                                      [adjacent_coord]))
-                        for coord in current_piece:
-                            stack.append(
-                                (coord, current_piece + [adjacent_coord]))
+        while reach:
+            low = reach & -reach
+            for pid in CELL_PLACEMENTS[low.bit_length() - 1]:
+                if not PLACEMENT_MASKS[pid] & occupied:
+                    piece_combinations.add(PLACEMENT_ACTIONS[pid])
+            reach ^= low
 
         return piece_combinations
 
@@ -218,15 +353,111 @@ class Board:
 
         # Turn 3 onwards
         else:
-            for my_cell in my_cells:
-                piece_combinations = self.generate_piece_combinations(my_cell)
+            my_mask = cells_to_mask(my_cells)
+            opponent_mask = cells_to_mask(opponent_cells)
 
-                for piece in piece_combinations:
-                    c1, c2, c3, c4 = piece
-                    action = PlaceAction(c1, c2, c3, c4)
+            # keep the empty placements covering a cell next to our own
+            return {
+                PLACEMENT_ACTIONS[pid]
+                for pid in iter_placement_ids(my_mask, opponent_mask, self.turn_count)
+            }
 
-                    moves.add(action)
-            return moves
+    def iter_clearing_ids(self, color: PlayerColor) -> Iterator[int]:
+        """
+        Generate the placement id of every move of the given player that
+        would complete a row or column.
+        """
+
+        red, blue = cells_to_mask(self.red_cells), cells_to_mask(self.blue_cells)
+        if color == PlayerColor.RED:
+            return iter_clearing_ids(red, blue)
+        return iter_clearing_ids(blue, red)
+
+    def iter_move_ids(self, color: PlayerColor) -> Iterator[int]:
+        """
+        Generate the placement id of every move the given player could
+        make on the current board, without building PlaceActions. Unlike
+        generate_all_moves, the first blue move yields every legal
+        placement rather than one random pick.
+        """
+
+        red, blue = cells_to_mask(self.red_cells), cells_to_mask(self.blue_cells)
+        if color == PlayerColor.RED:
+            return iter_placement_ids(red, blue, self.turn_count)
+        return iter_placement_ids(blue, red, self.turn_count)
+
+    def count_moves(self, color: PlayerColor) -> int:
+        """
+        Number of moves the given player could make on the current board,
+        counted like iter_move_ids.
+        """
+
+        red, blue = cells_to_mask(self.red_cells), cells_to_mask(self.blue_cells)
+        if color == PlayerColor.RED:
+            return count_placements(red, blue, self.turn_count)
+        return count_placements(blue, red, self.turn_count)
+
+    def line_clear_gain(self, action: PlaceAction, color: PlayerColor = None) -> int:
+        """
+        Number of opponent cells that would be removed by the lines the
+        given action completes, without applying it. The action is played
+        by `color`, by default the player to move.
+        """
+
+        placed = action.coords
+        red_rows, blue_rows = self.row_counts
+        red_cols, blue_cols = self.col_counts
+
+        cleared = set()
+        for cell in placed:
+            in_row = sum(1 for other in placed if other.r == cell.r)
+            if red_rows[cell.r] + blue_rows[cell.r] + in_row == BOARD_N:
+                cleared.update(Coord(cell.r, x) for x in range(BOARD_N))
+
+            in_col = sum(1 for other in placed if other.c == cell.c)
+            if red_cols[cell.c] + blue_cols[cell.c] + in_col == BOARD_N:
+                cleared.update(Coord(x, cell.c) for x in range(BOARD_N))
+
+        if not cleared:
+            return 0
+
+        if color is None:
+            color = self.turn_color
+        opponent_cells = self.blue_cells if color == PlayerColor.RED else self.red_cells
+        return len(opponent_cells & cleared)
+
+    def frontier_sizes(self) -> tuple[int, int]:
+        """
+        Number of empty cells adjacent to each player's cells, i.e. where
+        their next pieces can reach, indexed by PlayerColor.
+        """
+
+        red, blue = cells_to_mask(self.red_cells), cells_to_mask(self.blue_cells)
+        occupied = red | blue
+        return (frontier(red, occupied).bit_count(),
+                frontier(blue, occupied).bit_count())
+
+    def token_count(self, color: PlayerColor) -> int:
+        """
+        Number of cells occupied by the given player.
+        """
+
+        cells = self.red_cells if color == PlayerColor.RED else self.blue_cells
+        return len(cells)
+
+    def row_count(self, color: PlayerColor, r: int) -> int:
+        """
+        Number of cells occupied by the given player in row `r`.
+        """
+
+        return self.row_counts[color][r]
+
+    def col_count(self, color: PlayerColor, c: int) -> int:
+        """
+        Number of cells occupied by the given player in column `c`.
+        """
+
+        return self.col_counts[color][c]
 
     def render(self, use_color: bool = False, use_unicode: bool = False) -> str:
         """
@@ -267,31 +498,48 @@ class Board:
             output += "\n"
         return output
 
-    @property
-    def game_over(self) -> bool:
+    def terminal_status(self) -> tuple[bool, PlayerColor | None]:
         """
-        True iff the game is over.
+        Whether the game is over and who won it, worked out once and cached
+        until the board next changes.
+
+        Returns a (game over, winner) pair. The winner is None while the
+        game goes on, and after a draw.
         """
 
+        if self._status is not None:
+            return self._status
+
         if self.turn_limit_reached:
-            return True
+            # In this case the player with the most tokens wins, or if equal,
+            # the game ends in a draw.
+            if self.balance == 0:
+                status = (True, None)
+            else:
+                status = (True, PlayerColor.RED if self.balance > 0 else PlayerColor.BLUE)
 
-        if self.turn_count in [0, 1]:
-            return False
+        elif self.turn_count in [0, 1]:
+            status = (False, None)
 
-        if self.turn_color == PlayerColor.RED:
-            my_cells = self.red_cells
         else:
-            my_cells = self.blue_cells
+            red, blue = cells_to_mask(self.red_cells), cells_to_mask(self.blue_cells)
+            my_cells = red if self.turn_color == PlayerColor.RED else blue
+            if has_legal_move(my_cells, red | blue):
+                status = (False, None)
+            else:
+                # Current player cannot place any more pieces. Opponent wins.
+                status = (True, self.turn_color.opponent)
 
-        for cell in my_cells:
-            piece_combinations = self.generate_piece_combinations(cell)
+        self._status = status
+        return status
 
-            if len(piece_combinations) > 0:
-                return False
+    @property
+    def game_over(self) -> bool:
+        """
+        True iff the game is over.
+        """
 
-        # Tried all possible moves and none were legal.
-        return True
+        return self.terminal_status()[0]
 
     @property
     def winner_color(self) -> PlayerColor | None:
@@ -299,24 +547,7 @@ class Board:
         The player (color) who won the game, or None if no player has won.
         """
 
-        if not self.game_over:
-            return None
-
-        if self.turn_limit_reached:
-            # In this case the player with the most tokens wins, or if equal,
-            # the game ends in a draw.
-            red_count = len(self.red_cells)
-            blue_count = len(self.blue_cells)
-            balance = red_count - blue_count
-
-            if balance == 0:
-                return None
-
-            return PlayerColor.RED if balance > 0 else PlayerColor.BLUE
-
-        else:
-            # Current player cannot place any more pieces. Opponent wins.
-            return self.turn_color.opponent
+        return self.terminal_status()[1]
 
     @property
     def turn_limit_reached(self) -> bool:
@@ -0,0 +1,207 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+# Opening book of the minimax agent. Positions are stored up to translation
+# around the torus: each is keyed by the smallest Zobrist key among its
+# translations, with the book move for that translation.
+#
+# Build it offline with:
+#   python -m agent.book [plies] [seconds per position]
+# The shipped book covers 2 plies at 10 seconds per position. Each record
+# keeps the depth its move was searched to, so that an entry shallower
+# than the agent's own search can be skipped.
+
+from referee.game.player import PlayerColor
+from referee.game.actions import PlaceAction
+from referee.game.pieces import BOARD_N
+from .bitboard import BitBoard
+from .placements import (PLACEMENT_ACTIONS, PLACEMENT_IDS, PLACEMENT_MASKS,
+                         cells_to_mask, translate)
+from .zobrist import zobrist_key
+import mmap
+import os
+import struct
+import sys
+
+BOOK_PATH = os.path.join(os.path.dirname(__file__), "opening_book.bin")
+
+# File header: magic, number of turns covered, number of records
+BOOK_MAGIC = b"TBK2"
+HEADER = struct.Struct("<4sII")
+
+# Records sorted by key: canonical Zobrist key, canonical placement id,
+# depth of the search that chose it
+RECORD = struct.Struct("<QHB")
+
+# Defaults of the command line builder, as used for the shipped book
+BUILD_PLIES = 2
+BUILD_SECONDS = 10.0
+
+
+def canonical(red: int, blue: int, turn_color: PlayerColor) -> tuple[int, int, int]:
+    """
+    Finds the translation of a position with the smallest Zobrist key.
+
+    Returns that key, and the rows and columns to move the position down
+    and right by to reach it.
+    """
+
+    best = None
+    for dr in range(BOARD_N):
+        for dc in range(BOARD_N):
+            key = zobrist_key(translate(red, dr, dc), translate(blue, dr, dc), turn_color)
+            if best is None or key < best[0]:
+                best = (key, dr, dc)
+    return best
+
+
+class OpeningBook:
+    """
+    A read-only opening book, memory-mapped from a file written by
+    `write_book`.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.plies, self._size = HEADER.unpack_from(self._data, 0)
+        if magic != BOOK_MAGIC:
+            raise ValueError(f"{path} is not an opening book")
+
+    def probe(self, key: int) -> tuple[int, int] | None:
+        """
+        Returns the placement id stored for a canonical key and the depth it
+        was searched to, or None if the position is not in the book.
+        """
+
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            found, pid, depth = RECORD.unpack_from(
+                self._data, HEADER.size + middle * RECORD.size)
+            if found == key:
+                return pid, depth
+            if found < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return None
+
+    def lookup(self, board, min_depth: int = 0) -> PlaceAction | None:
+        """
+        Returns the book move for a board, or None if it is not in the book
+        or was searched to less than `min_depth`.
+        """
+
+        if board.turn_count >= self.plies:
+            return None
+
+        if isinstance(board, BitBoard):
+            red, blue = board.red, board.blue
+        else:
+            red, blue = cells_to_mask(board.red_cells), cells_to_mask(board.blue_cells)
+
+        key, dr, dc = canonical(red, blue, board.turn_color)
+        entry = self.probe(key)
+        if entry is None or entry[1] < min_depth:
+            return None
+        pid = entry[0]
+
+        # move the book move back from the canonical translation
+        mask = translate(PLACEMENT_MASKS[pid], -dr % BOARD_N, -dc % BOARD_N)
+        return PLACEMENT_ACTIONS[PLACEMENT_IDS[mask]]
+
+    def close(self):
+        self._data.close()
+
+
+def load_book(path: str = BOOK_PATH) -> OpeningBook | None:
+    """
+    Returns the opening book at `path`, or None if there is no book file.
+    """
+
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+def write_book(path: str, book: dict[int, tuple[int, int]], plies: int):
+    """
+    Write a book, as canonical key -> (placement id, searched depth),
+    covering the first `plies` turns of the game.
+    """
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(BOOK_MAGIC, plies, len(book)))
+        for key in sorted(book):
+            file.write(RECORD.pack(key, *book[key]))
+
+
+def _replies(boards: list[BitBoard]) -> dict[int, BitBoard]:
+    """
+    Returns every position one move after the given boards, as canonical
+    key -> canonical board.
+    """
+
+    positions = {}
+    for board in boards:
+        for action in board.generate_all_moves():
+            child = board.__copy__()
+            child.apply_action(action)
+            key, dr, dc = canonical(child.red, child.blue, child.turn_color)
+            if key not in positions:
+                positions[key] = BitBoard(translate(child.red, dr, dc),
+                                          translate(child.blue, dr, dc),
+                                          child.turn_color, child.turn_count)
+    return positions
+
+
+def build_book(plies: int, seconds: float) -> dict[int, tuple[int, int]]:
+    """
+    Search every position the book can reach in the first `plies` turns,
+    for `seconds` each: the book's side plays its book move, and the other
+    side any legal move.
+
+    Returns the book as canonical key -> (placement id, searched depth).
+    """
+
+    from .program import Agent
+
+    agents = {color: Agent(color) for color in PlayerColor}
+    book = {}
+
+    # canonical positions after each number of turns played
+    start = BitBoard()
+    levels = [{canonical(0, 0, start.turn_color)[0]: start}]
+    levels.append(_replies([start]))
+
+    for ply in range(plies):
+        if ply >= 2:
+            played = []
+            for key, board in levels[ply - 2].items():
+                board = board.__copy__()
+                board.apply_action(PLACEMENT_ACTIONS[book[key][0]])
+                played.append(board)
+            levels.append(_replies(played))
+
+        for index, (key, board) in enumerate(levels[ply].items()):
+            agent = agents[board.turn_color]
+            agent.board = board.__copy__()
+            agent.tt.new_search()
+            agent.orderer.new_search()
+            agent.last_depth = 0
+            moves = agent.board.generate_all_moves()
+            action = agent.id_minimax(seconds, {hash(agent.board): moves})
+            book[key] = (PLACEMENT_IDS[cells_to_mask(action.coords)], agent.last_depth)
+            print(f"turn {ply + 1}: {index + 1}/{len(levels[ply])} "
+                  f"depth {agent.last_depth}", file=sys.stderr)
+
+    return book
+
+
+if __name__ == "__main__":
+    plies = int(sys.argv[1]) if len(sys.argv) > 1 else BUILD_PLIES
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else BUILD_SECONDS
+    write_book(BOOK_PATH, build_book(plies, seconds), plies)
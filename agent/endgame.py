@@ -0,0 +1,164 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from referee.game.player import PlayerColor
+from referee.game.actions import PlaceAction
+from referee.game.constants import MAX_TURNS
+from .board import Board
+from .bitboard import BitBoard
+from .placements import PLACEMENT_ACTIONS
+
+# Game results, from the point of view of the player to move
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+# The solver is used once both players together have at most this many
+# moves, or at most ENDGAME_TURNS turns are left
+ENDGAME_MOVES = 24
+ENDGAME_TURNS = 2
+
+# Most nodes a single call to `solve` may visit before giving up
+ENDGAME_NODES = 500
+
+# Most positions kept in the solved cache, which is emptied when full
+SOLVED_CACHE_SIZE = 1 << 18
+
+
+class SolverBudgetExceeded(Exception):
+    """
+    Raised inside the endgame solver when it runs out of nodes.
+    """
+
+
+class EndgameSolver:
+    """
+    Exact win/draw/loss search of positions close to the end of the game,
+    with the bounds found for each position kept in a cache between calls.
+    """
+
+    def __init__(self, max_nodes: int = ENDGAME_NODES):
+        self.max_nodes = max_nodes
+
+        # (key, turn count) -> (lower bound, upper bound, best move id);
+        # the result of a position depends on the turns left
+        self.solved: dict[tuple[int, int], tuple[int, int, int | None]] = {}
+
+        # nodes visited by the running call to `solve`
+        self.nodes = 0
+
+    def applies(self, board: Board | BitBoard) -> bool:
+        """
+        True iff the board is close enough to the end of the game for the
+        solver to be worth trying.
+        """
+
+        if board.turn_count < 2:
+            return False
+        if MAX_TURNS - board.turn_count <= ENDGAME_TURNS:
+            return True
+        moves = board.count_moves(PlayerColor.RED)
+        if moves > ENDGAME_MOVES:
+            return False
+        return moves + board.count_moves(PlayerColor.BLUE) <= ENDGAME_MOVES
+
+    def solve(self, board: Board | BitBoard) -> tuple[int, PlaceAction | None] | None:
+        """
+        Solve the board for the player to move, on a copy so that running
+        out of nodes cannot leave the board mid-search.
+
+        Returns the result (WIN, DRAW or LOSS) and a move reaching it, or
+        None if the node budget ran out first.
+        """
+
+        if len(self.solved) >= SOLVED_CACHE_SIZE:
+            self.solved.clear()
+
+        self.nodes = 0
+        try:
+            result = self.negamax(board.__copy__(), LOSS, WIN)
+        except SolverBudgetExceeded:
+            return None
+
+        entry = self.solved.get((hash(board), board.turn_count))
+        pid = entry[2] if entry is not None else None
+        return (result, PLACEMENT_ACTIONS[pid] if pid is not None else None)
+
+    def negamax(self, board: Board | BitBoard, alpha: int, beta: int) -> int:
+        """
+        Alpha-beta search to the end of the game, with results from the
+        point of view of the player to move.
+
+        Returns the result of the board, exact if it is strictly between
+        alpha and beta, otherwise a bound on the side it failed.
+        """
+
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise SolverBudgetExceeded()
+
+        game_over, winner = board.terminal_status()
+        if game_over:
+            if winner is None:
+                return DRAW
+            return WIN if winner == board.turn_color else LOSS
+
+        cache_key = (hash(board), board.turn_count)
+        lower, upper, best_pid = self.solved.get(cache_key, (LOSS, WIN, None))
+        if lower == upper or lower >= beta:
+            return lower
+        if upper <= alpha:
+            return upper
+        alpha = max(alpha, lower)
+        beta = min(beta, upper)
+
+        pids = self.order(board, best_pid)
+
+        original_alpha = alpha
+        best_val = LOSS - 1
+        for pid in pids:
+            record = board.apply_action(PLACEMENT_ACTIONS[pid])
+            val = -self.negamax(board, -beta, -alpha)
+            board.undo_action(record)
+
+            if best_val < val:
+                best_val = val
+                best_pid = pid
+            alpha = max(alpha, best_val)
+            if alpha >= beta:
+                break
+
+        if best_val <= original_alpha:
+            upper = best_val
+        elif best_val >= beta:
+            lower = best_val
+        else:
+            lower = upper = best_val
+        self.solved[cache_key] = (lower, upper, best_pid)
+
+        return best_val
+
+    def order(self, board: Board | BitBoard, best_pid: int | None) -> list[int]:
+        """
+        Orders the moves of the player to move, the best move of an earlier
+        call first, then by the number of moves left to the opponent, as
+        the game is mostly won by leaving the opponent nowhere to play.
+
+        Returns the ordered placement ids.
+        """
+
+        opponent = board.turn_color.opponent
+        replies = {}
+        for pid in board.iter_move_ids(board.turn_color):
+            record = board.apply_action(PLACEMENT_ACTIONS[pid])
+            replies[pid] = board.count_moves(opponent)
+            board.undo_action(record)
+
+        # looking at a child costs about as much as searching it
+        self.nodes += len(replies)
+
+        pids = sorted(replies, key=replies.__getitem__)
+        if best_pid in replies:
+            pids.remove(best_pid)
+            pids.insert(0, best_pid)
+        return pids
@@ -0,0 +1,105 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from referee.game.player import PlayerColor
+from .shared_tt import SharedTranspositionTable
+import math
+import multiprocessing
+import random
+from time import monotonic
+
+# Helper orderings are shaken up with history scores up to this value
+HISTORY_NOISE = 16
+
+
+class LazySMP:
+    """
+    Helper processes, alive for the whole game, that search the same root
+    as the main search at staggered depths and with shuffled move orders.
+    They only communicate through the shared transposition table, which
+    the main search then finds filled with their results.
+    """
+
+    def __init__(self, color: PlayerColor, n_helpers: int, tt: SharedTranspositionTable):
+        self.n_helpers = n_helpers
+
+        # set once the main search is done, so the helpers stop early
+        self._stop = multiprocessing.Value("b", 0, lock=False)
+
+        self._tasks = [multiprocessing.Queue() for _ in range(n_helpers)]
+        self._helpers = [
+            multiprocessing.Process(
+                target=_helper_main,
+                args=(color, index, tasks, tt, self._stop),
+                daemon=True,
+            )
+            for index, tasks in enumerate(self._tasks)
+        ]
+        for helper in self._helpers:
+            helper.start()
+
+    def start(self, board, deadline: float, generation: int):
+        """
+        Start every helper searching the given board until `deadline`, a
+        time.monotonic() time. `generation` is the shared table's
+        generation in the main process.
+        """
+
+        self._stop.value = 0
+        for tasks in self._tasks:
+            tasks.put(("search", board, deadline, generation))
+
+    def stop(self):
+        """
+        Ask the helpers to abandon their current search.
+        """
+
+        self._stop.value = 1
+
+    def close(self):
+        """
+        Stop all the helpers.
+        """
+
+        self.stop()
+        for tasks in self._tasks:
+            tasks.put(("stop",))
+        for helper in self._helpers:
+            helper.join()
+
+
+def _helper_main(color: PlayerColor, index: int, tasks, tt: SharedTranspositionTable, stop):
+    """
+    Entry point of a helper process. Helper `index` starts iterative
+    deepening at depth 1 + index % 2 and seeds its history table with
+    random noise, so that helpers explore the tree in different orders.
+    """
+
+    from .program import Agent
+
+    agent = Agent(color, workers=0, helpers=0)
+    agent.tt = tt
+    rng = random.Random(index)
+
+    def clock() -> float:
+        return math.inf if stop.value else monotonic()
+
+    agent.clock = clock
+
+    while True:
+        message = tasks.get()
+        match message[0]:
+            case "search":
+                _, board, deadline, generation = message
+                agent.board = board
+                agent.tt.generation = generation
+                agent.orderer.new_search()
+                agent.orderer.history = [
+                    score + rng.randrange(HISTORY_NOISE)
+                    for score in agent.orderer.history
+                ]
+                valid_moves_dict = {hash(board): board.generate_all_moves()}
+                agent.id_minimax(deadline - monotonic(), valid_moves_dict,
+                                 start_depth=1 + index % 2)
+            case "stop":
+                return
@@ -0,0 +1,100 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from referee.game.actions import PlaceAction
+from .placements import PLACEMENT_ACTIONS, PLACEMENT_IDS, action_mask
+
+# Number of killer moves remembered per ply
+KILLER_SLOTS = 2
+
+# Base scores for each class of move, far enough apart that the classes
+# never mix: TT move, then line clears, then killers, then history
+TT_MOVE_SCORE = 1 << 40
+CAPTURE_SCORE = 1 << 30
+KILLER_SCORE = 1 << 29
+
+
+class MoveOrderer:
+    """
+    Orders the moves of a node so that alpha-beta tries the most promising
+    ones first. Subclass and override `order` to plug in another scheme.
+
+    Moves are tried in this order:
+        1. the principal variation's move, or the best move stored in the
+           transposition table,
+        2. moves completing a row or column, by opponent cells cleared,
+        3. killer moves that caused a cutoff at the same ply,
+        4. the rest, by history heuristic score.
+    """
+
+    def __init__(self):
+        # ply (i.e. board turn count) -> placement ids of recent cutoffs
+        self.killers: dict[int, list[int]] = {}
+
+        # placement id -> accumulated cutoff score
+        self.history: list[int] = [0] * len(PLACEMENT_ACTIONS)
+
+        # ply -> placement id of the principal variation's move
+        self.pv: dict[int, int] = {}
+
+    def new_search(self):
+        """
+        Forget killers from the previous search and age the history scores,
+        so that recent cutoffs count for more.
+        """
+
+        self.killers.clear()
+        self.history = [score >> 1 for score in self.history]
+        self.pv.clear()
+
+    def set_pv(self, board, pv: list[PlaceAction]):
+        """
+        Remember the principal variation found from the given board, so the
+        next iteration tries its moves first.
+        """
+
+        self.pv = {
+            board.turn_count + ply: PLACEMENT_IDS[action_mask(move)]
+            for ply, move in enumerate(pv)
+        }
+
+    def order(self, board, moves, tt_move: PlaceAction | None = None) -> list[PlaceAction]:
+        """
+        Returns the given moves sorted from most to least promising.
+        """
+
+        tt_pid = PLACEMENT_IDS[action_mask(tt_move)] if tt_move is not None else -1
+        pv_pid = self.pv.get(board.turn_count, -1)
+        killers = self.killers.get(board.turn_count, ())
+        history = self.history
+
+        def score(move: PlaceAction) -> int:
+            pid = PLACEMENT_IDS[action_mask(move)]
+            if pid == pv_pid:
+                return TT_MOVE_SCORE + 1
+            if pid == tt_pid:
+                return TT_MOVE_SCORE
+
+            gain = board.line_clear_gain(move)
+            if gain > 0:
+                return CAPTURE_SCORE + gain
+
+            if pid in killers:
+                return KILLER_SCORE
+
+            return history[pid]
+
+        return sorted(moves, key=score, reverse=True)
+
+    def record_cutoff(self, board, move: PlaceAction, depth: int):
+        """
+        Remember a move that caused a beta cutoff at the given board.
+        """
+
+        pid = PLACEMENT_IDS[action_mask(move)]
+        self.history[pid] += depth * depth
+
+        killers = self.killers.setdefault(board.turn_count, [])
+        if pid not in killers:
+            killers.insert(0, pid)
+            del killers[KILLER_SLOTS:]
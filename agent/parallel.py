@@ -0,0 +1,170 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from referee.game.player import PlayerColor
+from referee.game.actions import PlaceAction
+from .placements import PLACEMENT_ACTIONS, PLACEMENT_IDS, action_mask
+import math
+import multiprocessing
+from time import monotonic
+
+
+class RootSplitter:
+    """
+    A pool of worker processes, alive for the whole game, that search
+    disjoint subsets of the root moves in parallel.
+
+    The board is sent to each worker once per turn with `set_board`. The
+    workers share the best root score found so far, so that subtrees
+    searched later prune against it.
+    """
+
+    def __init__(self, color: PlayerColor, n_workers: int):
+        self.n_workers = n_workers
+
+        # best root score so far, from the point of view of the root player
+        self._best = multiprocessing.Value("d", -(math.inf))
+
+        self._results = multiprocessing.Queue()
+        self._tasks = [multiprocessing.Queue() for _ in range(n_workers)]
+        self._workers = [
+            multiprocessing.Process(
+                target=_worker_main,
+                args=(color, tasks, self._results, self._best),
+                daemon=True,
+            )
+            for tasks in self._tasks
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def set_board(self, board):
+        """
+        Send the board of the current turn to every worker.
+        """
+
+        for tasks in self._tasks:
+            tasks.put(("board", board))
+
+    def search(self, moves: list[PlaceAction], depth: int, deadline: float) -> tuple[float, PlaceAction | None, int, bool]:
+        """
+        Search each root move to the given depth, dealing the moves out to
+        the workers in turn so that each gets a share of the best ones.
+        `deadline` is a time.monotonic() time, as the workers' CPU time
+        does not count against this process.
+
+        Returns the best score from the root player's point of view, the
+        best move, the number of nodes searched and whether every worker
+        finished before the deadline.
+        """
+
+        self._best.value = -(math.inf)
+        pids = [PLACEMENT_IDS[action_mask(move)] for move in moves]
+        for index, tasks in enumerate(self._tasks):
+            tasks.put(("search", depth, pids[index::self.n_workers], deadline))
+
+        best_value = -(math.inf)
+        best_pid = None
+        best_exact = False
+        nodes = 0
+        completed = True
+        for _ in range(self.n_workers):
+            done, value, pid, exact, worker_nodes = self._results.get()
+            completed = completed and done
+            nodes += worker_nodes
+
+            # a fail-low bound can tie with the exact score of a better move
+            if pid is not None and (value > best_value or
+                                    (value == best_value and exact and not best_exact)):
+                best_value, best_pid, best_exact = value, pid, exact
+
+        best_move = PLACEMENT_ACTIONS[best_pid] if best_pid is not None else None
+        return (best_value, best_move, nodes, completed)
+
+    def close(self):
+        """
+        Stop all the workers.
+        """
+
+        for tasks in self._tasks:
+            tasks.put(("stop",))
+        for worker in self._workers:
+            worker.join()
+
+
+def _worker_main(color: PlayerColor, tasks, results, best):
+    """
+    Entry point of a worker process: keeps its own agent, and so its own
+    transposition table and move ordering, between turns.
+    """
+
+    from .program import Agent
+
+    agent = Agent(color, workers=0, helpers=0)
+    agent.clock = monotonic
+    board = None
+
+    while True:
+        message = tasks.get()
+        match message[0]:
+            case "board":
+                board = message[1]
+                agent.tt.new_search()
+                agent.orderer.new_search()
+            case "search":
+                _, depth, pids, deadline = message
+                results.put(_search_moves(
+                    agent, board.__copy__(), depth, pids, deadline, best))
+            case "stop":
+                return
+
+
+def _search_moves(agent, board, depth: int, pids: list[int], deadline: float, best) -> tuple:
+    """
+    Search the given root moves, raising the shared best score whenever a
+    move beats it.
+
+    Returns whether all moves were searched before the deadline, the best
+    score from the root player's point of view, its placement id, whether
+    that score is exact rather than a bound, and the nodes searched.
+    """
+
+    from .program import SearchTimeout
+
+    # +1 when RED is to move, -1 when BLUE is
+    sign = int(board.turn_color)
+    valid_moves_dict = {}
+
+    best_value = -(math.inf)
+    best_pid = None
+    best_exact = False
+    completed = True
+
+    agent.nodes = 0
+    agent.deadline = deadline
+    try:
+        for pid in pids:
+            alpha = best.value
+            record = board.apply_action(PLACEMENT_ACTIONS[pid])
+            if sign == 1:
+                value = agent.search(
+                    board, depth - 1, alpha, math.inf, valid_moves_dict)[0]
+            else:
+                value = -agent.search(
+                    board, depth - 1, -(math.inf), -alpha, valid_moves_dict)[0]
+            board.undo_action(record)
+
+            if value > best_value:
+                best_value, best_pid, best_exact = value, pid, value > alpha
+
+            with best.get_lock():
+                if value > best.value:
+                    best.value = value
+
+    except SearchTimeout:
+        completed = False
+
+    finally:
+        agent.deadline = None
+
+    return (completed, best_value, best_pid, best_exact, agent.nodes)
@@ -0,0 +1,269 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+# Precomputed table of every piece placement on the board, built once at
+# import. Cells are numbered r * BOARD_N + c, so a set of cells fits in a
+# single 121-bit integer.
+
+from collections.abc import Iterator
+
+from referee.game.coord import Coord
+from referee.game.actions import PlaceAction
+from referee.game.constants import *
+from referee.game.pieces import PieceType, _TEMPLATES
+
+CELL_N = BOARD_N * BOARD_N
+
+# Number of cells in a tetromino
+PIECE_CELLS = 4
+FULL_MASK = (1 << CELL_N) - 1
+
+ROW_MASKS = [
+    sum(1 << (r * BOARD_N + c) for c in range(BOARD_N))
+    for r in range(BOARD_N)
+]
+COL_MASKS = [
+    sum(1 << (r * BOARD_N + c) for r in range(BOARD_N))
+    for c in range(BOARD_N)
+]
+
+# Every row then every column
+LINE_MASKS = ROW_MASKS + COL_MASKS
+FIRST_COL = COL_MASKS[0]
+LAST_COL = COL_MASKS[BOARD_N - 1]
+
+# Columns that wrap around to the left edge when moving right by dc
+WRAP_COLS = [
+    sum(COL_MASKS[BOARD_N - 1 - i] for i in range(dc))
+    for dc in range(BOARD_N)
+]
+
+
+def cell_index(coord: Coord) -> int:
+    """
+    Index of the bit representing the given Coord.
+    """
+
+    return coord.r * BOARD_N + coord.c
+
+
+def cells_to_mask(cells) -> int:
+    """
+    Convert an iterable of Coords into a bitmask.
+    """
+
+    mask = 0
+    for cell in cells:
+        mask |= 1 << (cell.r * BOARD_N + cell.c)
+    return mask
+
+
+def action_mask(action: PlaceAction) -> int:
+    """
+    Bitmask of the cells covered by an action. Faster than
+    `cells_to_mask(action.coords)` as it does not build a set.
+    """
+
+    return ((1 << (action.c1.r * BOARD_N + action.c1.c))
+            | (1 << (action.c2.r * BOARD_N + action.c2.c))
+            | (1 << (action.c3.r * BOARD_N + action.c3.c))
+            | (1 << (action.c4.r * BOARD_N + action.c4.c)))
+
+
+def mask_to_cells(mask: int) -> set[Coord]:
+    """
+    Convert a bitmask back into a set of Coords.
+    """
+
+    cells = set()
+    while mask:
+        low = mask & -mask
+        index = low.bit_length() - 1
+        cells.add(Coord(index // BOARD_N, index % BOARD_N))
+        mask ^= low
+    return cells
+
+
+def neighbours(cells: int) -> int:
+    """
+    Bitmask of the cells adjacent to any of `cells`, wrapping around the
+    torus, found with a constant number of shifts whatever the number of
+    cells.
+    """
+
+    down = (cells << BOARD_N | cells >> (CELL_N - BOARD_N)) & FULL_MASK
+    up = (cells >> BOARD_N | cells << (CELL_N - BOARD_N)) & FULL_MASK
+    right = (cells & ~LAST_COL) << 1 | (cells & LAST_COL) >> (BOARD_N - 1)
+    left = (cells & ~FIRST_COL) >> 1 | (cells & FIRST_COL) << (BOARD_N - 1)
+    return down | up | right | left
+
+
+def translate(cells: int, dr: int, dc: int) -> int:
+    """
+    Bitmask of `cells` moved down `dr` rows and right `dc` columns,
+    wrapping around the torus.
+    """
+
+    shift = dr * BOARD_N
+    cells = (cells << shift | cells >> (CELL_N - shift)) & FULL_MASK
+    wrap = WRAP_COLS[dc]
+    return (cells & ~wrap) << dc | (cells & wrap) >> (BOARD_N - dc)
+
+
+def frontier(my_cells: int, occupied: int) -> int:
+    """
+    Bitmask of the empty cells adjacent to any of `my_cells`.
+    """
+
+    return neighbours(my_cells) & ~occupied
+
+
+# Bitmask of the 4 cells adjacent to each cell (wrapping around the torus)
+NEIGHBOUR_MASKS = [
+    cells_to_mask([coord.down(), coord.up(), coord.left(), coord.right()])
+    for coord in (Coord(i // BOARD_N, i % BOARD_N) for i in range(CELL_N))
+]
+
+# Placement id -> cells covered by the placement
+PLACEMENT_MASKS: list[int] = []
+
+# Placement id -> PlaceAction with its coords in sorted order
+PLACEMENT_ACTIONS: list[PlaceAction] = []
+
+# Cell index -> ids of every placement covering that cell
+CELL_PLACEMENTS: list[list[int]] = [[] for _ in range(CELL_N)]
+
+# Cells bitmask -> placement id, used to identify arbitrary PlaceActions
+PLACEMENT_IDS: dict[int, int] = {}
+
+# Placement id -> masks of the distinct rows and columns it crosses
+PLACEMENT_LINES: list[list[int]] = []
+
+for _piece_type in PieceType:
+    for _r in range(BOARD_N):
+        for _c in range(BOARD_N):
+            _coords = sorted(
+                Coord((_r + offset.r) % BOARD_N, (_c + offset.c) % BOARD_N)
+                for offset in _TEMPLATES[_piece_type]
+            )
+            _pid = len(PLACEMENT_MASKS)
+            for _coord in _coords:
+                CELL_PLACEMENTS[cell_index(_coord)].append(_pid)
+            PLACEMENT_MASKS.append(cells_to_mask(_coords))
+            PLACEMENT_ACTIONS.append(PlaceAction(*_coords))
+            PLACEMENT_IDS[PLACEMENT_MASKS[_pid]] = _pid
+            PLACEMENT_LINES.append(
+                [ROW_MASKS[r] for r in sorted({coord.r for coord in _coords})]
+                + [COL_MASKS[c] for c in sorted({coord.c for coord in _coords})])
+
+# Placements used on the very first turn, all anchored at (0, 0)
+ORIGIN_PLACEMENTS = [
+    type_index * CELL_N for type_index in range(len(PieceType))
+]
+
+
+def placement_id(action: PlaceAction) -> int:
+    """
+    Id of the placement matching the given action, whatever the order of
+    its coords.
+    """
+
+    return PLACEMENT_IDS[action_mask(action)]
+
+
+def has_legal_move(my_cells: int, occupied: int) -> bool:
+    """
+    Whether a player owning `my_cells` can place any piece touching them,
+    stopping at the first legal placement found.
+    """
+
+    reach = frontier(my_cells, occupied)
+    while reach:
+        low = reach & -reach
+        for pid in CELL_PLACEMENTS[low.bit_length() - 1]:
+            if not PLACEMENT_MASKS[pid] & occupied:
+                return True
+        reach ^= low
+    return False
+
+
+def iter_placement_ids(my_cells: int, opponent_cells: int, turn_count: int) -> Iterator[int]:
+    """
+    Generate the id of every placement a player owning `my_cells` could
+    legally make after `turn_count` turns, each exactly once and without
+    building any PlaceAction or set.
+    """
+
+    occupied = my_cells | opponent_cells
+
+    # First red move
+    if turn_count == 0:
+        yield from ORIGIN_PLACEMENTS
+
+    # First blue move, kept away from the opponent's first piece
+    elif turn_count == 1:
+        blocked = occupied | frontier(opponent_cells, occupied)
+        for pid, mask in enumerate(PLACEMENT_MASKS):
+            if not mask & blocked:
+                yield pid
+
+    # Turn 3 onwards
+    else:
+        reach = frontier(my_cells, occupied)
+        blocked = occupied
+        while reach:
+            low = reach & -reach
+            for pid in CELL_PLACEMENTS[low.bit_length() - 1]:
+                if not PLACEMENT_MASKS[pid] & blocked:
+                    yield pid
+            # placements covering this cell are done, skip them from now on
+            blocked |= low
+            reach ^= low
+
+
+def count_placements(my_cells: int, opponent_cells: int, turn_count: int) -> int:
+    """
+    Number of placements `iter_placement_ids` generates, without keeping
+    any of them.
+    """
+
+    if turn_count in [0, 1]:
+        return sum(1 for _ in iter_placement_ids(my_cells, opponent_cells, turn_count))
+
+    count = 0
+    blocked = my_cells | opponent_cells
+    reach = frontier(my_cells, blocked)
+    while reach:
+        low = reach & -reach
+        for pid in CELL_PLACEMENTS[low.bit_length() - 1]:
+            if not PLACEMENT_MASKS[pid] & blocked:
+                count += 1
+        blocked |= low
+        reach ^= low
+    return count
+
+
+def iter_clearing_ids(my_cells: int, opponent_cells: int) -> Iterator[int]:
+    """
+    Generate the id of every legal placement (from turn 3 onwards) of a
+    player owning `my_cells` that completes at least one row or column.
+    Only lines with at most 4 empty cells are looked at, and only the
+    placements covering all of a line's empty cells.
+    """
+
+    occupied = my_cells | opponent_cells
+    reach = frontier(my_cells, occupied)
+    found = set()
+
+    for line in LINE_MASKS:
+        empty = line & ~occupied
+        if not empty or empty.bit_count() > PIECE_CELLS:
+            continue
+
+        low = empty & -empty
+        for pid in CELL_PLACEMENTS[low.bit_length() - 1]:
+            mask = PLACEMENT_MASKS[pid]
+            if (mask & empty == empty and mask & reach and not mask & occupied
+                    and pid not in found):
+                found.add(pid)
+                yield pid
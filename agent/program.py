@@ -2,26 +2,97 @@
 # Project Part B: Game Playing Agent
 
 from referee.game import PlayerColor, Action, PlaceAction
-from referee.game.pieces import BOARD_N
+from referee.game.constants import MAX_TURNS
 from .board import Board
+from .bitboard import BitBoard
+from .transposition import TranspositionTable, EXACT, LOWER, UPPER, FLIPPED_BOUND
+from .ordering import MoveOrderer
+from .timing import TimeManager
+from .parallel import RootSplitter
+from .shared_tt import SharedTranspositionTable
+from .lazysmp import LazySMP
+from .book import BOOK_PATH, load_book
+from .endgame import EndgameSolver, LOSS
+from .batch_eval import HAVE_NUMPY, PLACEMENT_GRIDS, eval_children, mask_grid
+from .placements import PIECE_CELLS, PLACEMENT_ACTIONS, PLACEMENT_IDS, action_mask, cells_to_mask
+import atexit
 import math
 import random
-from datetime import datetime, timedelta
+from time import process_time, monotonic
 
 # Eval for a winning state, ensuring it is bigger
 # than any eval calculated by formula, but smaller than inf
 WINNING_SCORE = 999
 
-# Avoid placing this many cells on one line if possible
-BAD_LINE = 6
+# Weight in the eval of the token balance and bad line counts
+MATERIAL_WEIGHT = 2
 
-# If a board has this many possible moves, it is safe to
-# call minimax at depth of only 1.
-LARGE_BRANCH_FACTOR = 200
+# Weight in the eval of the difference in frontier sizes, as a player
+# with nowhere left to place a piece loses
+MOBILITY_WEIGHT = 1
 
-# The time limit given to decide a move using ID minimax
+# The time limit given to decide a move using ID minimax, when the
+# referee does not report how much time is left
 DECIDING_TIME = 0.5
 
+# A position where either side has at most this many moves gets extra
+# thinking time
+FEW_MOVES = 10
+
+# A position where either side can clear at least this many of the other's
+# cells gets extra thinking time. Smaller clears are possible in most
+# positions after the opening
+BIG_CLEAR = 7
+
+# Number of worker processes splitting the root moves, 0 to search in
+# this process only
+PARALLEL_WORKERS = 0
+
+# Number of Lazy SMP helper processes searching alongside the main search
+# through a shared transposition table, 0 to search in this process only
+LAZY_SMP_HELPERS = 0
+
+# Search on the integer bitmask board instead of the set-based board
+USE_BITBOARD = True
+
+# Search with principal variation search instead of minimax_ab
+USE_PVS = True
+
+# Evaluate the children of the last ply of a search in one NumPy pass,
+# when NumPy is installed
+USE_BATCH_EVAL = True
+
+# Extend the leaves of a search with moves that complete a line, so that
+# it does not stop right before a line clear. Off as it did not win more
+# games at short time limits
+USE_QUIESCENCE = False
+
+# Most nodes searched by the quiescence search from a single leaf
+QUIESCENCE_NODES = 32
+
+# Play the moves of the opening book, when there is a book file
+USE_BOOK = True
+
+# Least depth a book move must have been searched to, in positions the
+# agent would otherwise search, as the search reaches depth 3 on the
+# second move of a 180 second game
+BOOK_MIN_DEPTH = 3
+
+# Solve positions close to the end of the game exactly before searching
+USE_ENDGAME_SOLVER = True
+
+# Width of the zero window used by PVS, evals are always integers
+NULL_WINDOW = 1
+
+# Number of nodes searched between two checks of the clock
+TIME_CHECK_NODES = 128
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a search when the time given to decide a move runs out.
+    """
+
 
 class Agent:
     """
@@ -29,7 +100,8 @@ class Agent:
     respond to various Tetress game events.
     """
 
-    def __init__(self, color: PlayerColor, **referee: dict):
+    def __init__(self, color: PlayerColor, workers: int = PARALLEL_WORKERS,
+                 helpers: int = LAZY_SMP_HELPERS, **referee: dict):
         """
         This constructor method runs when the referee instantiates the agent.
         """
@@ -42,7 +114,75 @@ class Agent:
                 print("Testing: I am playing as BLUE")
 
         # initialise internal rep of board
-        self.board: Board = Board()
+        self.board: Board | BitBoard = BitBoard() if USE_BITBOARD else Board()
+
+        # search results, kept across iterative deepening passes and turns
+        self.tt = TranspositionTable()
+
+        # decides the order in which minimax_ab tries moves
+        self.orderer = MoveOrderer()
+
+        # the search algorithm used to pick a move
+        self.search = self.pvs if USE_PVS else self.minimax_ab
+
+        # whether the last ply of a search is evaluated with eval_leaves
+        self.batch_eval = USE_BATCH_EVAL and HAVE_NUMPY
+
+        # opening moves searched offline, None if there is no book
+        self.book = load_book(BOOK_PATH) if USE_BOOK else None
+
+        # exact search of the last few moves, None to always use the eval
+        self.endgame = EndgameSolver() if USE_ENDGAME_SOLVER else None
+
+        # nodes the running quiescence search may still visit
+        self.quiescence_budget = 0
+
+        # number of nodes visited by searches, for benchmarking
+        self.nodes = 0
+
+        # time at which the running search must stop, or None if it may
+        # run to completion, measured by self.clock
+        self.deadline: float | None = None
+        self.clock = process_time
+
+        # depth of the last completed iterative deepening pass
+        self.last_depth = 0
+
+        # decides how long to think about each move
+        self.timer = TimeManager(DECIDING_TIME)
+
+        # worker processes for root-parallel search, kept between turns
+        self.splitter = RootSplitter(color, workers) if workers > 0 else None
+
+        # helper processes for Lazy SMP search, sharing the table
+        self.smp = None
+        if helpers > 0:
+            self.tt = SharedTranspositionTable()
+            self.clock = monotonic
+            self.smp = LazySMP(color, helpers, self.tt)
+
+        # the referee never tells the agent the game is over, so stop the
+        # processes and free the shared table when the program exits
+        if self.splitter is not None or self.smp is not None:
+            atexit.register(self.close)
+
+    def close(self):
+        """
+        Stop the worker and helper processes and free the shared
+        transposition table, if any. The agent can still search after,
+        in this process only.
+        """
+
+        atexit.unregister(self.close)
+        if self.splitter is not None:
+            self.splitter.close()
+            self.splitter = None
+        if self.smp is not None:
+            self.smp.close()
+            self.smp = None
+            self.tt.close()
+            self.tt = TranspositionTable()
+            self.clock = process_time
 
     def action(self, **referee: dict) -> Action:
         """
@@ -52,12 +192,20 @@ class Agent:
 
         valid_moves_dict: dict[int, set[PlaceAction]] = {}
         valid_moves_dict[hash(self.board)] = self.board.generate_all_moves()
+        self.tt.new_search()
+        self.orderer.new_search()
 
-        if self.board.turn_count in [0, 1]:
+        action = self.book_move(valid_moves_dict[hash(self.board)])
+
+        if action is not None:
+            print("Testing: playing a book move")
+
+        elif self.board.turn_count in [0, 1]:
             action = random.choice(list(valid_moves_dict[hash(self.board)]))
 
         else:
-            action = self.determine_move(valid_moves_dict)
+            action = self.determine_move(
+                valid_moves_dict, referee.get("time_remaining"))
 
         match self._color:
             case PlayerColor.RED:
@@ -82,7 +230,7 @@ class Agent:
 
         print(f"Testing: {color} played PLACE action: {c1}, {c2}, {c3}, {c4}")
 
-    def minimax_ab(self, board: Board, depth: int, alpha, beta, valid_moves_dict) -> tuple[int, PlaceAction]:
+    def minimax_ab(self, board: Board | BitBoard, depth: int, alpha, beta, valid_moves_dict) -> tuple[int, PlaceAction]:
         """
         Minimax algorithm with alpha-beta pruning on the given Board.
 
@@ -91,9 +239,42 @@ class Agent:
         Code adapted from: https://www.youtube.com/watch?v=l-hh51ncgDI&t=2s
         """
 
+        self.nodes += 1
+        self.check_time()
+
+        if depth == 0 and USE_QUIESCENCE:
+            return (self.quiescence(board, alpha, beta), None)
+
         if depth == 0 or board.game_over:
             return (eval(board), None)
 
+        # reuse the result of an equal or deeper search of this position
+        alpha_orig, beta_orig = alpha, beta
+        entry = self.tt.probe(hash(board))
+        tt_move = entry.move if entry is not None else None
+        if entry is not None and entry.depth >= depth:
+            if entry.bound == EXACT:
+                return (entry.score, entry.move)
+            elif entry.bound == LOWER:
+                alpha = max(alpha, entry.score)
+            else:
+                beta = min(beta, entry.score)
+            if alpha >= beta:
+                return (entry.score, entry.move)
+
+        if depth == 1 and self.batch_eval:
+            sign = int(board.turn_color)
+            if sign == 1:
+                value, best_move, bound = self.eval_leaves(
+                    board, alpha, beta, valid_moves_dict, tt_move)
+            else:
+                value, best_move, bound = self.eval_leaves(
+                    board, -beta, -alpha, valid_moves_dict, tt_move)
+            if sign == -1:
+                bound = FLIPPED_BOUND[bound]
+            self.tt.store(hash(board), depth, sign * value, bound, best_move)
+            return (sign * value, best_move)
+
         if board.turn_color == PlayerColor.RED:
             best_move = None
             maxEval = -(math.inf)
@@ -103,12 +284,13 @@ class Agent:
                 valid_moves_dict[hash(board)] = valid_moves
             else:
                 valid_moves = valid_moves_dict[hash(board)]
+            valid_moves = self.orderer.order(board, valid_moves, tt_move)
 
             for move in valid_moves:
-                child = board.__copy__()
-                child.apply_action(move)
+                record = board.apply_action(move)
                 val = self.minimax_ab(
-                    child, depth - 1, alpha, beta, valid_moves_dict)[0]
+                    board, depth - 1, alpha, beta, valid_moves_dict)[0]
+                board.undo_action(record)
 
                 if maxEval < val:
                     maxEval = val
@@ -116,9 +298,10 @@ class Agent:
 
                 alpha = max(alpha, maxEval)
                 if alpha >= beta:
+                    self.orderer.record_cutoff(board, move, depth)
                     break
 
-            return (maxEval, best_move)
+            value = maxEval
 
         else:
             best_move = None
@@ -129,12 +312,13 @@ class Agent:
                 valid_moves_dict[hash(board)] = valid_moves
             else:
                 valid_moves = valid_moves_dict[hash(board)]
+            valid_moves = self.orderer.order(board, valid_moves, tt_move)
 
             for move in valid_moves:
-                child = board.__copy__()
-                child.apply_action(move)
+                record = board.apply_action(move)
                 val = self.minimax_ab(
-                    child, depth - 1, alpha, beta, valid_moves_dict)[0]
+                    board, depth - 1, alpha, beta, valid_moves_dict)[0]
+                board.undo_action(record)
 
                 if minEval > val:
                     minEval = val
@@ -142,43 +326,468 @@ class Agent:
 
                 beta = min(beta, minEval)
                 if beta <= alpha:
+                    self.orderer.record_cutoff(board, move, depth)
                     break
 
-            return (minEval, best_move)
+            value = minEval
+
+        if value <= alpha_orig:
+            bound = UPPER
+        elif value >= beta_orig:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.tt.store(hash(board), depth, value, bound, best_move)
+
+        return (value, best_move)
+
+    def pvs(self, board: Board | BitBoard, depth: int, alpha, beta, valid_moves_dict) -> tuple[int, PlaceAction]:
+        """
+        Principal variation search on the given Board, a drop-in
+        replacement for minimax_ab: scores and the window are from RED's
+        point of view.
+
+        Returns the best move to play accordingly with its eval.
+        """
+
+        if board.turn_color == PlayerColor.RED:
+            return self.negascout(board, depth, alpha, beta, valid_moves_dict)
+
+        value, move = self.negascout(
+            board, depth, -beta, -alpha, valid_moves_dict)
+        return (-value, move)
+
+    def negascout(self, board: Board | BitBoard, depth: int, alpha, beta, valid_moves_dict) -> tuple[int, PlaceAction]:
+        """
+        Negamax form of principal variation search (NegaScout). Scores and
+        the window are from the point of view of the player to move.
+
+        The first move is searched with the full window, the rest with a
+        zero window, re-searching only those that turn out to be better.
+
+        Returns the best move to play accordingly with its eval.
+        """
+
+        self.nodes += 1
+        self.check_time()
+
+        # +1 when RED is to move, -1 when BLUE is
+        sign = int(board.turn_color)
+
+        if depth == 0 and USE_QUIESCENCE:
+            self.quiescence_budget = QUIESCENCE_NODES
+            return (self.quiesce(board, alpha, beta), None)
+
+        if depth == 0 or board.game_over:
+            return (sign * eval(board), None)
+
+        # reuse the result of an equal or deeper search of this position,
+        # stored from RED's point of view
+        alpha_orig = alpha
+        entry = self.tt.probe(hash(board))
+        tt_move = entry.move if entry is not None else None
+        if entry is not None and entry.depth >= depth:
+            score = sign * entry.score
+            bound = entry.bound if sign == 1 else FLIPPED_BOUND[entry.bound]
+            if bound == EXACT:
+                return (score, entry.move)
+            elif bound == LOWER:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return (score, entry.move)
+
+        if depth == 1 and self.batch_eval:
+            value, best_move, bound = self.eval_leaves(
+                board, alpha, beta, valid_moves_dict, tt_move)
+            if sign == -1:
+                bound = FLIPPED_BOUND[bound]
+            self.tt.store(hash(board), depth, sign * value, bound, best_move)
+            return (value, best_move)
+
+        if hash(board) not in valid_moves_dict:
+            valid_moves = board.generate_all_moves()
+            valid_moves_dict[hash(board)] = valid_moves
+        else:
+            valid_moves = valid_moves_dict[hash(board)]
+        valid_moves = self.orderer.order(board, valid_moves, tt_move)
+
+        best_move = None
+        best_val = -(math.inf)
+
+        for move in valid_moves:
+            record = board.apply_action(move)
+            if best_move is None:
+                val = -self.negascout(
+                    board, depth - 1, -beta, -alpha, valid_moves_dict)[0]
+            else:
+                val = -self.negascout(
+                    board, depth - 1, -alpha - NULL_WINDOW, -alpha, valid_moves_dict)[0]
+                if alpha < val < beta:
+                    val = -self.negascout(
+                        board, depth - 1, -beta, -val, valid_moves_dict)[0]
+            board.undo_action(record)
+
+            if best_val < val:
+                best_val = val
+                best_move = move
+
+            alpha = max(alpha, best_val)
+            if alpha >= beta:
+                self.orderer.record_cutoff(board, move, depth)
+                break
+
+        if best_val <= alpha_orig:
+            bound = UPPER
+        elif best_val >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        if sign == -1:
+            bound = FLIPPED_BOUND[bound]
+        self.tt.store(hash(board), depth, sign * best_val, bound, best_move)
+
+        return (best_val, best_move)
+
+    def quiescence(self, board: Board | BitBoard, alpha, beta) -> int:
+        """
+        Quiescence search from a leaf of minimax_ab, with scores and the
+        window from RED's point of view.
+
+        Returns the eval of the board once no line clear is pending.
+        """
+
+        self.quiescence_budget = QUIESCENCE_NODES
+        if board.turn_color == PlayerColor.RED:
+            return self.quiesce(board, alpha, beta)
+        return -self.quiesce(board, -beta, -alpha)
+
+    def quiesce(self, board: Board | BitBoard, alpha, beta) -> int:
+        """
+        Negamax search of only the moves that complete a row or column,
+        from a leaf of the main search. The player to move may also stop
+        and take the static eval. At most self.quiescence_budget nodes are
+        expanded, after which the static eval is used. Scores and the
+        window are from the point of view of the player to move.
+
+        Returns the eval of the board once no line clear is pending.
+        """
+
+        self.nodes += 1
+        self.check_time()
+
+        # standing pat still places a piece somewhere quiet, which a line
+        # clear must beat to be worth playing
+        best_val = int(board.turn_color) * eval(board)
+        if board.game_over:
+            return best_val
+        best_val += MATERIAL_WEIGHT * PIECE_CELLS
+        if best_val >= beta:
+            return best_val
+        alpha = max(alpha, best_val)
+
+        for pid in board.iter_clearing_ids(board.turn_color):
+            if self.quiescence_budget <= 0:
+                break
+            self.quiescence_budget -= 1
+
+            record = board.apply_action(PLACEMENT_ACTIONS[pid])
+            val = -self.quiesce(board, -beta, -alpha)
+            board.undo_action(record)
+
+            if best_val < val:
+                best_val = val
+            alpha = max(alpha, best_val)
+            if alpha >= beta:
+                break
+
+        return best_val
+
+    def eval_leaves(self, board: Board | BitBoard, alpha, beta, valid_moves_dict, tt_move: PlaceAction | None) -> tuple[int, PlaceAction, int]:
+        """
+        Evaluates the children of a board one ply from the end of a search.
+        The first move in search order is tried alone, as it often causes
+        a cutoff. Otherwise every child is evaluated in one pass with
+        eval_children. With quiescence search, those evals only bound the
+        children's values from above, so children are then searched best
+        bound first until no bound left can beat the best value found.
+        Scores and the window are from the point of view of the player to
+        move.
+
+        Returns the best child value, the move reaching it, and the bound
+        type of that value.
+        """
+
+        # +1 when RED is to move, -1 when BLUE is
+        sign = int(board.turn_color)
+        alpha_orig = alpha
+
+        if hash(board) not in valid_moves_dict:
+            valid_moves_dict[hash(board)] = board.generate_all_moves()
+        moves = self.orderer.order(board, valid_moves_dict[hash(board)], tt_move)
+
+        record = board.apply_action(moves[0])
+        if USE_QUIESCENCE:
+            self.quiescence_budget = QUIESCENCE_NODES
+            best_val = -self.quiesce(board, -beta, -alpha)
+        else:
+            best_val = sign * eval(board)
+            self.nodes += 1
+        board.undo_action(record)
+        best_move = moves[0]
+        if best_val >= beta:
+            self.orderer.record_cutoff(board, best_move, 1)
+            return (best_val, best_move, LOWER)
+
+        if isinstance(board, BitBoard):
+            red, blue = board.red, board.blue
+        else:
+            red, blue = cells_to_mask(board.red_cells), cells_to_mask(board.blue_cells)
+        pids = [PLACEMENT_IDS[action_mask(move)] for move in moves]
+        scores = sign * eval_children(mask_grid(red), mask_grid(blue), PLACEMENT_GRIDS[pids],
+                                      board.turn_color, board.turn_count)
+
+        # a batch covers many nodes, so always read the clock after one
+        self.nodes += len(moves)
+        if self.deadline is not None and self.clock() > self.deadline:
+            raise SearchTimeout()
+
+        if not USE_QUIESCENCE:
+            best = scores.argmax()
+            return (int(scores[best]), moves[best], EXACT)
+
+        # the opponent's quiescence search credits them at least a quiet
+        # piece, so their reply can only lower a child's static eval, but
+        # a finished game is scored exactly
+        bounds = [
+            score if abs(score) >= WINNING_SCORE else score - MATERIAL_WEIGHT * PIECE_CELLS
+            for score in scores.tolist()
+        ]
+        alpha = max(alpha, best_val)
+        for index in sorted(range(1, len(moves)), key=bounds.__getitem__, reverse=True):
+            if bounds[index] <= best_val:
+                break
+
+            record = board.apply_action(moves[index])
+            self.quiescence_budget = QUIESCENCE_NODES
+            val = -self.quiesce(board, -beta, -alpha)
+            board.undo_action(record)
+
+            if best_val < val:
+                best_val = val
+                best_move = moves[index]
+
+            alpha = max(alpha, best_val)
+            if alpha >= beta:
+                self.orderer.record_cutoff(board, best_move, 1)
+                break
+
+        if best_val <= alpha_orig:
+            bound = UPPER
+        elif best_val >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+
+        return (best_val, best_move, bound)
+
+    def check_time(self):
+        """
+        Raises SearchTimeout if the deadline of the running search has
+        passed. The clock is only read every TIME_CHECK_NODES nodes.
+        """
+
+        if (self.deadline is not None and self.nodes % TIME_CHECK_NODES == 0
+                and self.clock() > self.deadline):
+            raise SearchTimeout()
+
+    def principal_variation(self, board: Board | BitBoard, depth: int) -> list[PlaceAction]:
+        """
+        Follows the best moves stored in the transposition table from the
+        given board, up to `depth` moves.
+
+        Returns the sequence of moves expected to be played.
+        """
+
+        pv = []
+        records = []
+        while len(pv) < depth:
+            entry = self.tt.probe(hash(board))
+            if entry is None or entry.move is None:
+                break
+            pv.append(entry.move)
+            records.append(board.apply_action(entry.move))
+
+        for record in reversed(records):
+            board.undo_action(record)
+
+        return pv
 
-    def id_minimax(self, time: float, valid_moves_dict):
+    def id_minimax(self, time: float, valid_moves_dict, start_depth: int = 1):
         """
         Caller function for iterative deepening minimax.        
-        If it still within the time limit given for deciding a move,
-        do minimax with one extra depth.
+        Searches with one extra depth at a time until the time limit given
+        for deciding a move runs out. The clock is checked inside the
+        search, and an iteration that does not finish in time is thrown
+        away. Each iteration tries the previous principal variation first.
 
-        Returns the best move to play accordingly.
+        Returns the best move of the deepest completed iteration.
         """
 
+        # search on a copy so an aborted search cannot corrupt self.board
+        board = self.board.__copy__()
+        action = None
+        depth = start_depth
+        self.deadline = self.clock() + time
+
+        try:
+            while True:
+                value, action = self.search(
+                    board, depth, -(math.inf), math.inf, valid_moves_dict)
+                self.last_depth = depth
+                self.orderer.set_pv(
+                    board, self.principal_variation(board, depth))
+
+                # no need to go deeper once the result is decided or the
+                # search already reaches the end of the game
+                if abs(value) >= WINNING_SCORE or depth >= MAX_TURNS - board.turn_count:
+                    break
+                depth += 1
+
+        except SearchTimeout:
+            pass
+
+        finally:
+            self.deadline = None
+
+        if action is None:
+            # not even depth 1 finished, fall back to the best move found
+            # so far, or any legal move
+            # (the copy may be left mid-search by the timeout)
+            entry = self.tt.probe(hash(self.board))
+            if entry is not None and entry.move is not None:
+                action = entry.move
+            else:
+                action = next(iter(valid_moves_dict[hash(self.board)]))
+
+        return action
+
+    def parallel_id_minimax(self, time: float, valid_moves_dict):
+        """
+        Iterative deepening with the root moves split across the worker
+        processes of self.splitter. Each pass tries the previous pass's
+        best move first, and a pass that does not finish in time is thrown
+        away. `time` is wall-clock time, as the workers' CPU time does not
+        count against this process.
+
+        Returns the best move of the deepest completed pass.
+        """
+
+        entry = self.tt.probe(hash(self.board))
+        moves = self.orderer.order(
+            self.board, valid_moves_dict[hash(self.board)],
+            entry.move if entry is not None else None)
+
+        self.splitter.set_board(self.board)
+        deadline = monotonic() + time
+        action = None
         depth = 1
-        start_time = datetime.now()
-        fin_time = start_time + timedelta(seconds=time)
 
-        while datetime.now() < fin_time:
-            value, action = self.minimax_ab(
-                self.board, depth, -(math.inf), math.inf, valid_moves_dict)
+        while True:
+            value, move, nodes, completed = self.splitter.search(
+                moves, depth, deadline)
+            self.nodes += nodes
+            if not completed:
+                break
+
+            action = move
+            self.last_depth = depth
+            moves.remove(move)
+            moves.insert(0, move)
+
+            if abs(value) >= WINNING_SCORE or depth >= MAX_TURNS - self.board.turn_count:
+                break
             depth += 1
 
+        if action is None:
+            action = moves[0]
+
         return action
 
-    def determine_move(self, valid_moves_dict):
-        dict_len = len(valid_moves_dict[hash(self.board)])
+    def book_move(self, valid_moves: set[PlaceAction]) -> PlaceAction | None:
+        """
+        Returns the opening book's move for the current board, or None if
+        there is no book, the board is not in it, or the book move was
+        searched less deeply than the agent would search it.
+        """
 
-        if dict_len > LARGE_BRANCH_FACTOR:
-            move = self.minimax_ab(
-                self.board, 1, -(math.inf), math.inf, valid_moves_dict)[1]
-        else:
-            time = DECIDING_TIME
-            move = self.id_minimax(time, valid_moves_dict)
-        return move
+        if self.book is None:
+            return None
+
+        # the first move of each side is random without the book
+        min_depth = BOOK_MIN_DEPTH if self.board.turn_count >= 2 else 0
+        action = self.book.lookup(self.board, min_depth)
+        if action not in valid_moves:
+            return None
+        return action
 
+    def is_critical(self, valid_moves: set[PlaceAction]) -> bool:
+        """
+        Whether the current board is worth extra thinking time: a side is
+        close to having no moves left, or can clear a large part of the
+        other side's cells.
 
-def eval(board: Board):
+        Returns True for a critical position.
+        """
+
+        board = self.board
+        opponent = board.turn_color.opponent
+        if len(valid_moves) <= FEW_MOVES or board.count_moves(opponent) <= FEW_MOVES:
+            return True
+
+        if any(board.line_clear_gain(move) >= BIG_CLEAR for move in valid_moves):
+            return True
+
+        return any(board.line_clear_gain(PLACEMENT_ACTIONS[pid], opponent) >= BIG_CLEAR
+                   for pid in board.iter_clearing_ids(opponent))
+
+    def determine_move(self, valid_moves_dict, time_remaining: float | None = None):
+        """
+        Decide how long to search for based on the CPU time the referee
+        reports as remaining, then search.
+
+        Returns the best move to play.
+        """
+
+        valid_moves = valid_moves_dict[hash(self.board)]
+        if len(valid_moves) == 1:
+            return next(iter(valid_moves))
+
+        # a proven win or draw is played at once, a proven loss is left to
+        # the search in case the opponent goes wrong
+        if self.endgame is not None and self.endgame.applies(self.board):
+            solution = self.endgame.solve(self.board)
+            if solution is not None and solution[0] > LOSS and solution[1] in valid_moves:
+                print(f"Testing: endgame solved in {self.endgame.nodes} nodes")
+                return solution[1]
+
+        time = self.timer.allocate(
+            time_remaining, self.board.turn_count, self.is_critical(valid_moves))
+        if self.splitter is not None:
+            return self.parallel_id_minimax(time, valid_moves_dict)
+
+        if self.smp is not None:
+            self.smp.start(self.board, monotonic() + time, self.tt.generation)
+            try:
+                return self.id_minimax(time, valid_moves_dict)
+            finally:
+                self.smp.stop()
+
+        return self.id_minimax(time, valid_moves_dict)
+
+
+def eval(board: Board | BitBoard):
     """
     Evaluation function to decide the value of a board.
 
@@ -186,31 +795,18 @@ def eval(board: Board):
     constant for a terminal state.
     """
 
-    if board.winner_color == PlayerColor.RED:
+    winner = board.terminal_status()[1]
+    if winner == PlayerColor.RED:
         return WINNING_SCORE
-    if board.winner_color == PlayerColor.BLUE:
+    if winner == PlayerColor.BLUE:
         return -WINNING_SCORE
 
-    blue_count = len(board.blue_cells)
-    red_count = len(board.red_cells)
-
-    # penalty if board has lines that are filled with too many of our colour
-    bad_red_lines = 0
-    bad_blue_lines = 0
-    for r in range(BOARD_N):
-        red = sum(1 for cell in board.red_cells if cell.r == r)
-        blue = sum(1 for cell in board.blue_cells if cell.r == r)
-        if red >= BAD_LINE:
-            bad_red_lines += 1
-        if blue >= BAD_LINE:
-            bad_blue_lines += 1
-
-    for c in range(BOARD_N):
-        red = sum(1 for cell in board.red_cells if cell.c == c)
-        blue = sum(1 for cell in board.blue_cells if cell.c == c)
-        if red >= BAD_LINE:
-            bad_red_lines += 1
-        if blue >= BAD_LINE:
-            bad_blue_lines += 1
-
-    return red_count - blue_count - (bad_red_lines - bad_blue_lines)
+    # penalty if board has lines that are filled with too many of our
+    # colour, both counts are kept up to date by the board
+    bad_red_lines, bad_blue_lines = board.bad_lines
+    material = board.balance - (bad_red_lines - bad_blue_lines)
+
+    # reward room to keep placing pieces
+    red_reach, blue_reach = board.frontier_sizes()
+
+    return MATERIAL_WEIGHT * material + MOBILITY_WEIGHT * (red_reach - blue_reach)
@@ -0,0 +1,158 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from multiprocessing import shared_memory
+
+from referee.game.actions import PlaceAction
+from .placements import PLACEMENT_ACTIONS, PLACEMENT_IDS, action_mask
+from .transposition import TTEntry, TT_SIZE
+
+# Each entry is two unsigned 64-bit words: the packed data, and the key
+# XOR the data. A reader only accepts an entry whose key checks out, so a
+# write torn by another process reads as a miss and no lock is needed.
+#
+# Layout of the data word, from the lowest bit:
+#   12 bits  placement id + 1 of the best move (0 if none)
+#    8 bits  depth
+#    2 bits  bound type
+#    8 bits  generation (mod 256)
+#   24 bits  score + SCORE_OFFSET
+WORDS_PER_ENTRY = 2
+ENTRY_BYTES = 8 * WORDS_PER_ENTRY
+
+MOVE_BITS = 12
+DEPTH_BITS = 8
+BOUND_BITS = 2
+GENERATION_BITS = 8
+SCORE_BITS = 24
+
+DEPTH_SHIFT = MOVE_BITS
+BOUND_SHIFT = DEPTH_SHIFT + DEPTH_BITS
+GENERATION_SHIFT = BOUND_SHIFT + BOUND_BITS
+SCORE_SHIFT = GENERATION_SHIFT + GENERATION_BITS
+
+SCORE_OFFSET = 1 << (SCORE_BITS - 1)
+KEY_MASK = (1 << 64) - 1
+
+
+def pack_entry(depth: int, score: int, bound: int, move: PlaceAction | None, generation: int) -> int:
+    """
+    Pack a search result into a single 64-bit data word.
+    """
+
+    move_id = PLACEMENT_IDS[action_mask(move)] + 1 if move is not None else 0
+    return (move_id
+            | depth << DEPTH_SHIFT
+            | bound << BOUND_SHIFT
+            | (generation & ((1 << GENERATION_BITS) - 1)) << GENERATION_SHIFT
+            | (int(score) + SCORE_OFFSET) << SCORE_SHIFT)
+
+
+def unpack_entry(key: int, data: int) -> TTEntry:
+    """
+    Unpack a data word written by `pack_entry`.
+    """
+
+    move_id = data & ((1 << MOVE_BITS) - 1)
+    return TTEntry(
+        key,
+        (data >> DEPTH_SHIFT) & ((1 << DEPTH_BITS) - 1),
+        (data >> SCORE_SHIFT) - SCORE_OFFSET,
+        (data >> BOUND_SHIFT) & ((1 << BOUND_BITS) - 1),
+        PLACEMENT_ACTIONS[move_id - 1] if move_id else None,
+        (data >> GENERATION_SHIFT) & ((1 << GENERATION_BITS) - 1),
+    )
+
+
+class SharedTranspositionTable:
+    """
+    A transposition table held in a `multiprocessing.shared_memory` block,
+    so several processes can search with the same table. It has the same
+    interface and replacement policy as `TranspositionTable`: each bucket
+    has a depth-preferred entry and an always-replace entry.
+
+    Scores must be integers. The process that creates the table owns the
+    block and must `close` it, other processes attach to it by name.
+    """
+
+    def __init__(self, size: int = TT_SIZE, name: str | None = None):
+        self._size = size
+        self._mask = size - 1
+        if name is None:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=2 * size * ENTRY_BYTES)
+            self._owner = True
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+        self._words = self._shm.buf.cast("Q")
+
+        # Kept per process, all processes move on to a new search together
+        self.generation = 0
+
+    def __getstate__(self):
+        return (self._size, self._shm.name, self.generation)
+
+    def __setstate__(self, state):
+        size, name, generation = state
+        self.__init__(size, name)
+        self.generation = generation
+
+    def new_search(self):
+        """
+        Mark the start of a new search (i.e. a new turn).
+        """
+
+        self.generation += 1
+
+    def _read(self, slot: int, key: int) -> TTEntry | None:
+        words = self._words
+        data = words[2 * slot]
+        if data == 0 or words[2 * slot + 1] != key ^ data:
+            return None
+        return unpack_entry(key, data)
+
+    def probe(self, key: int) -> TTEntry | None:
+        """
+        Returns the stored entry for the given key, or None if there is none.
+        """
+
+        key &= KEY_MASK
+        slot = 2 * (key & self._mask)
+
+        entry = self._read(slot, key)
+        if entry is None:
+            entry = self._read(slot + 1, key)
+        return entry
+
+    def store(self, key: int, depth: int, score: float, bound: int, move: PlaceAction | None):
+        """
+        Store a search result, replacing whichever entry of its bucket the
+        replacement policy allows.
+        """
+
+        key &= KEY_MASK
+        slot = 2 * (key & self._mask)
+        words = self._words
+
+        deep_data = words[2 * slot]
+        deep_key = words[2 * slot + 1] ^ deep_data
+        deep_depth = (deep_data >> DEPTH_SHIFT) & ((1 << DEPTH_BITS) - 1)
+        deep_generation = (deep_data >> GENERATION_SHIFT) & ((1 << GENERATION_BITS) - 1)
+        if not (deep_data == 0 or deep_key == key or deep_depth <= depth
+                or deep_generation != self.generation & ((1 << GENERATION_BITS) - 1)):
+            slot += 1
+
+        data = pack_entry(depth, score, bound, move, self.generation)
+        words[2 * slot] = data
+        words[2 * slot + 1] = key ^ data
+
+    def close(self):
+        """
+        Detach from the shared block, freeing it if this process owns it.
+        """
+
+        self._words.release()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
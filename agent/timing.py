@@ -0,0 +1,69 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from referee.game.constants import MAX_TURNS
+
+# CPU seconds kept in reserve for move generation, overshoot of the search
+# deadline and the referee's own overhead
+SAFETY_MARGIN = 5.0
+
+# Time multiplier for critical positions
+CRITICAL_FACTOR = 2.5
+
+# Never spend more than this fraction of the usable time on one move
+MAX_SHARE = 0.2
+
+# Lower bound on the time given to a move, while any time is left
+MIN_TIME = 0.05
+
+# Turns a game is expected to last, as games end when a player is stuck
+# long before MAX_TURNS (agent against greedy ended at turns 28 to 41)
+EXPECTED_GAME_TURNS = 40
+
+# Turns still expected once a game outlasts EXPECTED_GAME_TURNS
+MIN_TURNS_LEFT = 16
+
+
+class TimeManager:
+    """
+    Splits the CPU time left in the game across the turns still to play.
+    """
+
+    def __init__(self, default_time: float):
+        # time per move when the referee does not report a time limit
+        self.default_time = default_time
+
+    def allocate(
+        self,
+        time_remaining: float | None,
+        turn_count: int,
+        critical: bool = False,
+    ) -> float:
+        """
+        Decide how many CPU seconds to spend on the current move, given the
+        time the referee reports as remaining (None if unlimited) and the
+        number of turns played so far. The time is split across the turns
+        the game is expected to last. Critical positions get extra time.
+
+        Returns the time to give to the search.
+        """
+
+        if time_remaining is None:
+            return self.default_time
+
+        usable = time_remaining - SAFETY_MARGIN
+        if usable <= 0:
+            return MIN_TIME
+
+        # the game rarely lasts to MAX_TURNS, which only bounds the estimate
+        turns_left = min(MAX_TURNS - turn_count,
+                         max(MIN_TURNS_LEFT, EXPECTED_GAME_TURNS - turn_count))
+
+        # we play every other turn, including this one
+        own_turns_left = max(1, (turns_left + 1) // 2)
+
+        time = usable / own_turns_left
+        if critical:
+            time *= CRITICAL_FACTOR
+
+        return max(MIN_TIME, min(time, usable * MAX_SHARE))
@@ -0,0 +1,89 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from dataclasses import dataclass
+
+from referee.game.actions import PlaceAction
+
+# Bound types of a stored score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Bound type of a stored score seen from the other player's side
+FLIPPED_BOUND = {EXACT: EXACT, LOWER: UPPER, UPPER: LOWER}
+
+# Number of buckets in the table, must be a power of 2
+TT_SIZE = 1 << 16
+
+
+@dataclass(frozen=True, slots=True)
+class TTEntry:
+    """
+    A search result for one position.
+    """
+    key: int
+    depth: int
+    score: float
+    bound: int
+    move: PlaceAction | None
+    generation: int
+
+
+class TranspositionTable:
+    """
+    A fixed-size table of search results keyed by the board's Zobrist key.
+
+    Each bucket holds two entries: a depth-preferred one, which is only
+    replaced by a search at least as deep (or from an older search), and an
+    always-replace one that takes everything else.
+    """
+
+    def __init__(self, size: int = TT_SIZE):
+        self._mask = size - 1
+        self._deep: list[TTEntry | None] = [None] * size
+        self._recent: list[TTEntry | None] = [None] * size
+
+        # Incremented on every new search so entries from previous turns
+        # give way to fresh ones
+        self.generation = 0
+
+    def new_search(self):
+        """
+        Mark the start of a new search (i.e. a new turn).
+        """
+
+        self.generation += 1
+
+    def probe(self, key: int) -> TTEntry | None:
+        """
+        Returns the stored entry for the given key, or None if there is none.
+        """
+
+        index = key & self._mask
+
+        entry = self._deep[index]
+        if entry is not None and entry.key == key:
+            return entry
+
+        entry = self._recent[index]
+        if entry is not None and entry.key == key:
+            return entry
+
+        return None
+
+    def store(self, key: int, depth: int, score: float, bound: int, move: PlaceAction | None):
+        """
+        Store a search result, replacing whichever entry of its bucket the
+        replacement policy allows.
+        """
+
+        index = key & self._mask
+        entry = TTEntry(key, depth, score, bound, move, self.generation)
+
+        deep = self._deep[index]
+        if (deep is None or deep.key == key or deep.depth <= depth
+                or deep.generation != self.generation):
+            self._deep[index] = entry
+        else:
+            self._recent[index] = entry
@@ -0,0 +1,48 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+# Zobrist keys for hashing boards. A board's key is the XOR of one random
+# 64-bit key per occupied (cell, colour) pair, plus ZOBRIST_TURN when BLUE
+# is next to play, so placing or clearing a cell is a single XOR.
+
+from referee.game.player import PlayerColor
+from .placements import CELL_N
+
+import random
+
+# Fixed seed so that keys are the same in every process
+ZOBRIST_SEED = 30024
+
+_rng = random.Random(ZOBRIST_SEED)
+
+# Indexed by PlayerColor then cell index
+ZOBRIST_CELLS: list[list[int]] = [
+    [_rng.getrandbits(64) for _ in range(CELL_N)]
+    for _ in PlayerColor
+]
+ZOBRIST_TURN: int = _rng.getrandbits(64)
+
+
+def mask_key(mask: int, color: PlayerColor) -> int:
+    """
+    XOR of the keys of every cell in `mask` for the given colour.
+    """
+
+    keys = ZOBRIST_CELLS[color]
+    key = 0
+    while mask:
+        low = mask & -mask
+        key ^= keys[low.bit_length() - 1]
+        mask ^= low
+    return key
+
+
+def zobrist_key(red: int, blue: int, turn_color: PlayerColor) -> int:
+    """
+    Full Zobrist key of a board given as two bitmasks.
+    """
+
+    key = mask_key(red, PlayerColor.RED) ^ mask_key(blue, PlayerColor.BLUE)
+    if turn_color == PlayerColor.BLUE:
+        key ^= ZOBRIST_TURN
+    return key
@@ -0,0 +1,207 @@
+# Benchmarks of the minimax agent on a fixed set of positions.
+#
+# Compare search algorithms, with iterative deepening from depth 1:
+#   python bench.py search [max depth]
+# Compare root-parallel search with different numbers of workers:
+#   python bench.py parallel [seconds per position] [max workers]
+# Compare Lazy SMP search with different numbers of helpers:
+#   python bench.py smp [seconds per position] [max helpers]
+
+from referee.game import PlayerColor, Coord
+from agent.bitboard import BitBoard
+from agent.placements import cells_to_mask
+from agent.program import Agent
+import math
+import sys
+import time
+from time import monotonic
+
+BOARD_N = 11
+
+# (turns played, player to move, board)
+POSITIONS = [
+    (8, PlayerColor.RED, '''
+r . . . . . . . . . .
+r r r . b . . . . . .
+. r r . b b b . . . .
+. r r . b . b . . . .
+. r . b b . b . . . .
+. . . b . . . . . . .
+. . b b b b b b . . .
+. . . . . . . . . . .
+. . . . . . . . . . r
+r r . . . . . . . . r
+r r . . . . . . . . r
+'''),
+    (24, PlayerColor.RED, '''
+r r . . . b r r r r r
+. r r . b b r r r . r
+. r b b b b . r . . r
+r b b b b b . . r r r
+. . . . . . . . . . .
+r b . b b b b b . r r
+b b b b b . b b b r r
+b . b b b b b b b r .
+r b b b b b . . . r .
+r r . b b b r r r r r
+r . r r r r r . . r r
+'''),
+    (33, PlayerColor.BLUE, '''
+. . b b . . . . r r r
+. . . . . . . . . r .
+r r r b b r . b b b r
+r r r r r r . b b . r
+r r r . r . r . b r r
+b b . . . b . b b b b
+b b b . b b . b b b b
+. . r . b b b b . . b
+. r r . b b . . b . .
+r r r . b r b . b b r
+r r r . b r b . b . r
+'''),
+    (40, PlayerColor.RED, '''
+. . b r . r b b r r r
+b . b . . . r r . . .
+b . b b . . r r r r .
+. . b r b b b b r r r
+. . b r . . b b r b r
+r . . r b b b b r b b
+r . b b b b b b . b r
+r . b . r r r b b b .
+r . b b r r . b r . r
+. . b . r r b b r . r
+b . b r r r . . r r r
+'''),
+    (71, PlayerColor.BLUE, '''
+r b r . b b r b r b .
+b b r r . b b . r b b
+b b r r . b . b b b b
+r r r . r b r r r b r
+b r r r r . . b . b b
+. . . . . . . . . . .
+. . . . r r r r b b b
+b b . b r r r b b r b
+. b b b b . r b r r b
+r . r b b r r b r r r
+. b r b b . r r r . r
+'''),
+    (80, PlayerColor.RED, '''
+b r r r r r r . r r r
+. . . . . . . . . . .
+r b b b b . . . b b b
+r b b . b b b r . b b
+. b b b b . . r r r r
+. b b r r r r r r r .
+b . . b b b r r . b .
+. . . r r b b b b . .
+b . . b . b b b . r r
+b . r b b b b b r . .
+b . r . b r b b r r b
+'''),
+    (100, PlayerColor.RED, '''
+. . b b r r r . r b r
+r b . b r r b . r b r
+r b b b r r b . r b .
+. b b . b r b . b r r
+. b b b b r r . . r b
+b b b b . b r . r r b
+b r r r b b . . r b b
+b b . . . . . . . . .
+. . . . . . . . . . .
+. r . . . b r . r r r
+. r r r r . r . r . r
+'''),
+]
+
+
+def parse(turn_count: int, turn_color: PlayerColor, text: str) -> BitBoard:
+    rows = text.replace(" ", "").strip("\n").split("\n")
+    red = set()
+    blue = set()
+    for r in range(BOARD_N):
+        for c in range(BOARD_N):
+            if rows[r][c] == 'r':
+                red.add(Coord(r, c))
+            elif rows[r][c] == 'b':
+                blue.add(Coord(r, c))
+    return BitBoard(cells_to_mask(red), cells_to_mask(blue), turn_color, turn_count)
+
+
+def bench_search(name: str, max_depth: int):
+    """
+    Search every position up to `max_depth` with a fresh agent, using the
+    agent's search method called `name`.
+    """
+
+    nodes = 0
+    start = time.process_time()
+    for position in POSITIONS:
+        agent = Agent(position[1])
+        agent.board = parse(*position)
+        search = getattr(agent, name)
+        for depth in range(1, max_depth + 1):
+            search(agent.board, depth, -(math.inf), math.inf, {})
+        nodes += agent.nodes
+    elapsed = time.process_time() - start
+
+    print(f"{name:<12} depth {max_depth}: {nodes:>9} nodes "
+          f"{elapsed:8.2f}s {nodes / elapsed:9.0f} nodes/s")
+
+
+def bench_parallel(workers: int, seconds: float, helpers: int = 0):
+    """
+    Give every position `seconds` of wall-clock time with the root moves
+    split across `workers` processes, or with `helpers` Lazy SMP helper
+    processes (both 0 for a single process search).
+    """
+
+    agents = {color: Agent(color, workers=workers, helpers=helpers)
+              for color in PlayerColor}
+    nodes = 0
+    depths = []
+    start = monotonic()
+    for position in POSITIONS:
+        agent = agents[position[1]]
+        agent.board = parse(*position)
+        agent.nodes = 0
+        valid_moves_dict = {hash(agent.board): agent.board.generate_all_moves()}
+        agent.tt.new_search()
+        if workers > 0:
+            agent.parallel_id_minimax(seconds, valid_moves_dict)
+        elif helpers > 0:
+            agent.smp.start(agent.board, monotonic() + seconds, agent.tt.generation)
+            agent.id_minimax(seconds, valid_moves_dict)
+            agent.smp.stop()
+        else:
+            agent.clock = monotonic
+            agent.id_minimax(seconds, valid_moves_dict)
+        nodes += agent.nodes
+        depths.append(agent.last_depth)
+    elapsed = monotonic() - start
+
+    for agent in agents.values():
+        agent.close()
+
+    # helper nodes are not counted, only the main search's
+    label = f"{helpers:>2} helpers" if helpers > 0 else f"{workers:>2} workers"
+    print(f"{label}: {nodes:>9} nodes {nodes / elapsed:9.0f} nodes/s "
+          f"depths {depths}")
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "search"
+    if mode == "search":
+        max_depth = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+        for name in ("minimax_ab", "pvs"):
+            bench_search(name, max_depth)
+    elif mode == "parallel":
+        seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+        max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+        for workers in [0] + [2 ** i for i in range(max_workers.bit_length())
+                              if 2 ** i <= max_workers]:
+            bench_parallel(workers, seconds)
+    elif mode == "smp":
+        seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+        max_helpers = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+        for helpers in range(max_helpers + 1):
+            bench_parallel(0, seconds, helpers)
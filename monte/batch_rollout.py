@@ -0,0 +1,176 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+# Rollouts of many games at once with NumPy. Each game is a row of a
+# (B, 121) array of red cells and one of blue cells, and every step plays
+# one uniformly random legal placement in each game still going.
+
+from referee.game.player import PlayerColor
+from referee.game.constants import *
+from .placements import CELL_N, PLACEMENT_MASKS, SHIFTS, TYPE_SHIFT_INDEXES
+
+# NumPy is optional, without it monte plays rollouts one by one
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+# winner codes in the win vector returned by play_out_batch
+RED_WON = 1
+BLUE_WON = -1
+DRAW = 0
+
+# bytes holding the bitmask of a board
+ROW_BYTES = (CELL_N + 7) // 8
+
+if HAVE_NUMPY:
+    # PLACEMENTS[pid] is the row of cells covered by placement pid
+    PLACEMENTS = np.array(
+        [[mask >> cell & 1 for cell in range(CELL_N)] for mask in PLACEMENT_MASKS],
+        dtype=bool)
+else:
+    PLACEMENTS = None
+
+
+def cells_from_masks(masks) -> 'np.ndarray':
+    '''
+    (B, 121) boolean rows of the cells in each of a list of bitmasks
+    '''
+    data = b''.join(mask.to_bytes(ROW_BYTES, 'little') for mask in masks)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(-1, ROW_BYTES),
+                         axis=1, bitorder='little')
+    return bits[:, :CELL_N].astype(bool)
+
+
+def neighbours(cells):
+    '''
+    For (B, 121) boolean rows of cells, the cells next to any of them,
+    wrapping around the board
+    '''
+    grid = cells.reshape(-1, BOARD_N, BOARD_N)
+    near = (np.roll(grid, 1, axis=1) | np.roll(grid, -1, axis=1)
+            | np.roll(grid, 1, axis=2) | np.roll(grid, -1, axis=2))
+    return near.reshape(-1, CELL_N)
+
+
+def legal_anchors(reach, occupied):
+    '''
+    For (B, 121) boolean rows of reach and occupied cells, the anchor cells
+    of each piece type where it covers no occupied cell and a reach cell.
+
+    Returns a (B, piece types, 121) boolean array, in which [game, t, cell]
+    is placement id t * CELL_N + cell.
+    '''
+    free = ~occupied.reshape(-1, BOARD_N, BOARD_N)
+    reach = reach.reshape(-1, BOARD_N, BOARD_N)
+    moved_free = [np.roll(free, shift, axis=(1, 2)) for shift in SHIFTS]
+    moved_reach = [np.roll(reach, shift, axis=(1, 2)) for shift in SHIFTS]
+
+    anchors = np.empty((len(free), len(TYPE_SHIFT_INDEXES), CELL_N), dtype=bool)
+    for type_index, indexes in enumerate(TYPE_SHIFT_INDEXES):
+        fits = np.logical_and.reduce([moved_free[i] for i in indexes])
+        touches = np.logical_or.reduce([moved_reach[i] for i in indexes])
+        anchors[:, type_index] = (fits & touches).reshape(-1, CELL_N)
+    return anchors
+
+
+def random_placements(anchors, rng):
+    '''
+    A uniformly random legal placement id for each game of legal_anchors,
+    picking a piece type by its number of legal placements, then one of its
+    anchors. Games with no legal placement get any id.
+    '''
+    counts = anchors.sum(axis=2)
+    by_type = counts.cumsum(axis=1)
+    index = (rng.random(len(anchors)) * by_type[:, -1]).astype(np.int64)
+
+    piece = (by_type > index[:, None]).argmax(axis=1)
+    games = np.arange(len(anchors))
+    index -= by_type[games, piece] - counts[games, piece]
+
+    by_cell = anchors[games, piece].cumsum(axis=1)
+    cell = (by_cell > index[:, None]).argmax(axis=1)
+    return piece * CELL_N + cell
+
+
+def play_out_batch(red, blue, red_to_move, turn_count, rng=None):
+    '''
+    Play B games to the end in lockstep from the given positions: (B, 121)
+    boolean arrays of red and blue cells, a (B,) boolean array of whether
+    red moves next, and a (B,) int array of turns played. The arrays are
+    not changed.
+
+    Returns the (B,) win vector of RED_WON, BLUE_WON or DRAW.
+    '''
+    rng = rng if rng is not None else np.random.default_rng()
+    red = red.copy()
+    blue = blue.copy()
+    red_to_move = red_to_move.copy()
+    turn_count = turn_count.astype(np.int64)
+
+    winner = np.zeros(len(red), dtype=np.int8)
+    playing = turn_count < MAX_TURNS
+
+    # games already at the turn limit are won on tokens, as in the loop
+    ended = ~playing
+    winner[ended] = np.sign(red[ended].sum(axis=1) - blue[ended].sum(axis=1))
+
+    while playing.any():
+        games = np.flatnonzero(playing)
+        red_now = red[games]
+        blue_now = blue[games]
+        red_moves = red_to_move[games]
+
+        # free cells next to the player's own, anywhere on the first turns
+        occupied = red_now | blue_now
+        own = np.where(red_moves[:, None], red_now, blue_now)
+        reach = np.where((turn_count[games] < 2)[:, None], True, neighbours(own)) & ~occupied
+
+        # a player with no legal placement loses
+        anchors = legal_anchors(reach, occupied)
+        stuck = ~anchors.any(axis=(1, 2))
+        winner[games[stuck]] = np.where(red_moves[stuck], BLUE_WON, RED_WON)
+        playing[games[stuck]] = False
+
+        # uniformly random legal placement in every other game
+        moving = ~stuck
+        games = games[moving]
+        placed = PLACEMENTS[random_placements(anchors[moving], rng)]
+
+        red_moves = red_moves[moving]
+        red_now = red_now[moving] | (placed & red_moves[:, None])
+        blue_now = blue_now[moving] | (placed & ~red_moves[:, None])
+
+        # clear every full row and column
+        grid = (red_now | blue_now).reshape(-1, BOARD_N, BOARD_N)
+        full_rows = grid.sum(axis=2) == BOARD_N
+        full_cols = grid.sum(axis=1) == BOARD_N
+        kept = ~(full_rows[:, :, None] | full_cols[:, None, :]).reshape(-1, CELL_N)
+        red[games] = red_now & kept
+        blue[games] = blue_now & kept
+
+        red_to_move[games] = ~red_moves
+        turn_count[games] += 1
+
+        # the player with the most tokens wins at the turn limit
+        ended = games[turn_count[games] >= MAX_TURNS]
+        balance = red[ended].sum(axis=1) - blue[ended].sum(axis=1)
+        winner[ended] = np.sign(balance)
+        playing[ended] = False
+
+    return winner
+
+
+def play_out_board(red: int, blue: int, turn_color: PlayerColor, turn_count: int,
+                   batch: int, rng=None):
+    '''
+    Play batch games to the end from one position given as bitmasks.
+
+    Returns the win vector, see play_out_batch.
+    '''
+    cells = cells_from_masks([red, blue])
+    return play_out_batch(
+        np.repeat(cells[:1], batch, axis=0), np.repeat(cells[1:], batch, axis=0),
+        np.full(batch, turn_color == PlayerColor.RED), np.full(batch, turn_count), rng)
@@ -16,6 +16,9 @@ import random
 
 PIECE_N = 4
 
+# random walks tried by generate_rand_move before listing every move
+RAND_MOVE_TRIES = 20
+
 
 class Board:
 
@@ -267,7 +270,11 @@ class Board:
 
     def generate_rand_move(self) -> PlaceAction:
         '''
-        Returns a random move that can be made 
+        Returns a random move that can be made, found by a random walk over
+        empty cells starting next to one of the player's cells (anywhere on
+        the first two turns). Random walks cannot make every piece, so after
+        RAND_MOVE_TRIES failed walks a move is picked from all legal moves.
+        The game must not be over.
         '''
 
         if self.turn_color == PlayerColor.RED:
@@ -277,50 +284,35 @@ class Board:
             my_cells = self.blue_cells
             opponent_cells = self.red_cells
 
-        if self.turn_count == 1:
-            empty_coords = [
-                Coord(r, c)
-                for r in range(BOARD_N)
-                for c in range(BOARD_N)
-                if (Coord(r, c) not in opponent_cells)
-            ]
+        def is_empty(coord: Coord) -> bool:
+            return coord not in my_cells and coord not in opponent_cells
 
-            current_coord = random.choice(empty_coords)
+        if self.turn_count in (0, 1):
+            starts = [Coord(r, c) for r in range(BOARD_N) for c in range(BOARD_N)
+                      if is_empty(Coord(r, c))]
+        else:
+            starts = [coord for cell in my_cells for coord in self.adjacent(cell)
+                      if is_empty(coord)]
+
+        for _ in range(RAND_MOVE_TRIES):
+            if not starts:
+                break
+            current_coord = random.choice(starts)
             current_piece = [current_coord]
 
-            while len(current_piece) < 4:
-                valid_adjacents = [coord for coord in self.adjacent(
-                    current_coord) if coord not in (opponent_cells, current_piece)]
+            while len(current_piece) < PIECE_N:
+                valid_adjacents = [coord for coord in self.adjacent(current_coord)
+                                   if is_empty(coord) and coord not in current_piece]
+                if len(valid_adjacents) == 0:
+                    break
 
-                adjacent_coord = random.choice(valid_adjacents)
-                current_piece.append(adjacent_coord)
-                current_coord = adjacent_coord
+                current_coord = random.choice(valid_adjacents)
+                current_piece.append(current_coord)
 
-            c1, c2, c3, c4 = current_piece
-            action = PlaceAction(c1, c2, c3, c4)
-            return action
+            if len(current_piece) == PIECE_N:
+                return PlaceAction(*current_piece)
 
-        # board has 1+ piece of player colour
-        else:
-            while True:
-                random_pool = list(my_cells)
-                current_coord = random.choice(random_pool)
-                random_pool.remove(current_coord)
-                current_piece = [current_coord]
-
-                while len(current_piece) < 4:
-                    valid_adjacents = [coord for coord in self.adjacent(
-                        current_coord) if coord not in (my_cells, opponent_cells, current_piece)]
-                    if len(valid_adjacents) == 0:
-                        continue
-
-                    adjacent_coord = random.choice(valid_adjacents)
-                    current_piece.append(adjacent_coord)
-                    current_coord = adjacent_coord
-
-                c1, c2, c3, c4 = current_piece
-                action = PlaceAction(c1, c2, c3, c4)
-                return action
+        return random.choice(list(self.generate_all_moves()))
 
     def render(self, use_color: bool = False, use_unicode: bool = False) -> str:
         """
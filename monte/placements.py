@@ -0,0 +1,138 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+# Table of every piece placement on the board, so that a move can be stored
+# as a small integer id. Cells are numbered r * BOARD_N + c.
+
+from referee.game.coord import Coord
+from referee.game.actions import PlaceAction
+from referee.game.constants import *
+from referee.game.pieces import PieceType, _TEMPLATES
+
+CELL_N = BOARD_N * BOARD_N
+FULL_MASK = (1 << CELL_N) - 1
+
+ROW_MASKS = [sum(1 << (r * BOARD_N + c) for c in range(BOARD_N)) for r in range(BOARD_N)]
+COL_MASKS = [sum(1 << (r * BOARD_N + c) for r in range(BOARD_N)) for c in range(BOARD_N)]
+FIRST_COL = COL_MASKS[0]
+LAST_COL = COL_MASKS[BOARD_N - 1]
+
+# columns that wrap around to the left edge when moving right by dc
+WRAP_COLS = [sum(COL_MASKS[BOARD_N - 1 - i] for i in range(dc)) for dc in range(BOARD_N)]
+
+# piece type index -> (rows, columns) to move a board by so that each cell
+# of a piece lands on the piece's anchor cell. Placement id
+# type index * CELL_N + cell is the piece of that type anchored at cell
+TYPE_SHIFTS = [
+    [((-offset.r) % BOARD_N, (-offset.c) % BOARD_N) for offset in _TEMPLATES[piece_type]]
+    for piece_type in PieceType
+]
+
+# every distinct shift in TYPE_SHIFTS, and the same shifts as indexes into it
+SHIFTS = sorted({shift for shifts in TYPE_SHIFTS for shift in shifts})
+TYPE_SHIFT_INDEXES = [[SHIFTS.index(shift) for shift in shifts] for shifts in TYPE_SHIFTS]
+
+# placement id -> bitmask of the cells it covers
+PLACEMENT_MASKS: list[int] = []
+
+# placement id -> PlaceAction with its coords in sorted order
+PLACEMENT_ACTIONS: list[PlaceAction] = []
+
+# bitmask of cells -> placement id
+PLACEMENT_IDS: dict[int, int] = {}
+
+# cell index -> ids of every placement covering that cell
+CELL_PLACEMENTS: list[list[int]] = [[] for _ in range(CELL_N)]
+
+# placement id -> masks of the rows and columns it crosses
+PLACEMENT_LINES: list[tuple[int, ...]] = []
+
+
+def action_mask(action: PlaceAction) -> int:
+    '''
+    Bitmask of the cells covered by an action
+    '''
+    return ((1 << (action.c1.r * BOARD_N + action.c1.c))
+            | (1 << (action.c2.r * BOARD_N + action.c2.c))
+            | (1 << (action.c3.r * BOARD_N + action.c3.c))
+            | (1 << (action.c4.r * BOARD_N + action.c4.c)))
+
+
+def cells_to_mask(cells) -> int:
+    '''
+    Bitmask of an iterable of Coords
+    '''
+    mask = 0
+    for cell in cells:
+        mask |= 1 << (cell.r * BOARD_N + cell.c)
+    return mask
+
+
+def placement_id(action: PlaceAction) -> int:
+    '''
+    Id of the placement matching an action, whatever the order of its coords
+    '''
+    return PLACEMENT_IDS[action_mask(action)]
+
+
+for _piece_type in PieceType:
+    for _r in range(BOARD_N):
+        for _c in range(BOARD_N):
+            _coords = sorted(
+                Coord((_r + offset.r) % BOARD_N, (_c + offset.c) % BOARD_N)
+                for offset in _TEMPLATES[_piece_type]
+            )
+            _action = PlaceAction(*_coords)
+            for _coord in _coords:
+                CELL_PLACEMENTS[_coord.r * BOARD_N + _coord.c].append(len(PLACEMENT_MASKS))
+            PLACEMENT_IDS[action_mask(_action)] = len(PLACEMENT_MASKS)
+            PLACEMENT_MASKS.append(action_mask(_action))
+            PLACEMENT_ACTIONS.append(_action)
+            PLACEMENT_LINES.append(
+                tuple(ROW_MASKS[r] for r in {coord.r for coord in _coords})
+                + tuple(COL_MASKS[c] for c in {coord.c for coord in _coords}))
+
+
+def neighbours(cells: int) -> int:
+    '''
+    Bitmask of the cells next to any of cells, wrapping around the board,
+    in a fixed number of shifts
+    '''
+    down = (cells << BOARD_N | cells >> (CELL_N - BOARD_N)) & FULL_MASK
+    up = (cells >> BOARD_N | cells << (CELL_N - BOARD_N)) & FULL_MASK
+    right = (cells & ~LAST_COL) << 1 | (cells & LAST_COL) >> (BOARD_N - 1)
+    left = (cells & ~FIRST_COL) >> 1 | (cells & FIRST_COL) << (BOARD_N - 1)
+    return down | up | right | left
+
+
+def translate(cells: int, dr: int, dc: int) -> int:
+    '''
+    Bitmask of cells moved down dr rows and right dc columns, wrapping
+    around the board
+    '''
+    shift = dr * BOARD_N
+    cells = (cells << shift | cells >> (CELL_N - shift)) & FULL_MASK
+    wrap = WRAP_COLS[dc]
+    return (cells & ~wrap) << dc | (cells & wrap) >> (BOARD_N - dc)
+
+
+def legal_placement_ids(my_cells: int, occupied: int) -> list[int]:
+    '''
+    Ids of every placement touching one of my_cells and covering no
+    occupied cell, for turn 3 onwards
+    '''
+    return list(placements_over(neighbours(my_cells) & ~occupied, occupied))
+
+
+def placements_over(reach: int, occupied: int) -> set[int]:
+    '''
+    Ids of every placement covering a cell of reach and no occupied cell
+    '''
+    pids = set()
+    while reach:
+        low = reach & -reach
+        for pid in CELL_PLACEMENTS[low.bit_length() - 1]:
+            if not PLACEMENT_MASKS[pid] & occupied:
+                pids.add(pid)
+        reach ^= low
+    return pids
@@ -5,7 +5,10 @@ from referee.game import PlayerColor, Action, PlaceAction, coord
 from referee.game.pieces import *
 from .board import Board
 from referee.game.exceptions import IllegalActionException
-from .tree import TreeNode
+from .tree import Tree, ROOT, NO_NODE, copy_board
+from .placements import cells_to_mask
+from .rollout import play_out
+from .batch_rollout import HAVE_NUMPY, RED_WON, BLUE_WON, cells_from_masks, np, play_out_batch
 import random
 import math
 import copy
@@ -16,6 +19,20 @@ import cProfile
 GAME_WON = 1
 GAME_NOT_WON = 0
 
+# add children one at a time from a list of untried moves, limited by
+# progressive widening, instead of adding every child at once
+LAZY_EXPANSION = True
+
+# a node visited n times may have up to PW_K * n ** PW_ALPHA children
+PW_K = 2
+PW_ALPHA = 0.5
+
+# with LAZY_EXPANSION and NumPy, pick ROLLOUT_BATCH leaves and play one
+# rollout from each at once with batch_rollout.play_out_batch. Off, as on
+# one core it is only faster than play_out for batches of a few hundred
+BATCH_ROLLOUTS = False
+ROLLOUT_BATCH = 256
+
 
 class Agent:
     """
@@ -38,6 +55,10 @@ class Agent:
         # initialise internal rep of board
         self.board: Board = Board()
 
+        # search tree rooted at self.board, kept between turns so that
+        # rollouts from earlier turns still count
+        self.tree: Tree | None = None
+
     def action(self, **referee: dict) -> Action:
         """
         This method is called by the referee each time it is the agent's turn
@@ -49,7 +70,9 @@ class Agent:
         # eval, child = minimax_ab(self.board, 3, -(math.inf), math.inf, self._color)
         # action = child.last_piece
 
-        action = monte_carlo(self.board, self._color)
+        if self.tree is None:
+            self.tree = Tree(self.board)
+        action = monte_carlo(self.tree, self._color)
         match self._color:
             case PlayerColor.RED:
                 print("Testing: RED is playing a PLACE action")
@@ -71,6 +94,11 @@ class Agent:
 
         self.board.apply_action(place_action)
 
+        # keep the subtree under the played move, free the rest
+        if self.tree is not None:
+            child = self.tree.find_child(ROOT, place_action)
+            self.tree = self.tree.subtree(child) if child != NO_NODE else None
+
         # Here we are just printing out the PlaceAction coordinates for
         # demonstration purposes. You should replace this with your own logic
         # to update your agent's internal game state representation.
@@ -89,11 +117,13 @@ def empty_neighbours(board: Board, coord: Coord) -> list[Coord]:
 # Monte Carlo Implementation below ---------------------------------------------
 
 
-def monte_carlo(board: Board, self_colour: PlayerColor) -> PlaceAction:
+def monte_carlo(tree: Tree, self_colour: PlayerColor) -> PlaceAction:
     '''
     https://www.youtube.com/watch?v=UXW2yZndl7U
+    Searches from the root of tree, adding to the statistics it already holds
     curr state = initial state
     while time remaining:
+        (with LAZY_EXPANSION, see select_lazy instead)
         # selection
         while curr state is not a leaf node:
             curr state = child of curr state with max UCB1 value
@@ -110,73 +140,87 @@ def monte_carlo(board: Board, self_colour: PlayerColor) -> PlaceAction:
         backpropagate result at currstate to root
     '''
     counter = 0
-    # generate initial state i.e. root node + all its children
-    root = TreeNode(board)
-    actions = board.generate_all_moves()
-    # cProfile.Profile.runctx("actions = board.generate_all_moves()", globals(), locals())
-    for action in actions:
-        # make each action into a new TreeNode
-        child = Board(board.red_cells.copy(), board.blue_cells.copy(),
-                      board.turn_color, action, board.turn_count)
-        child.apply_action(action)
-
-        child_node = TreeNode(child)
-        root.add_child(child_node)
-    # correctly adding children & their parent (root)
+    # generate all children of the root, unless an earlier turn did
+    if not LAZY_EXPANSION and tree.is_leaf(ROOT):
+        tree.expand(ROOT, tree.root_board.generate_all_moves())
 
     sec_to_run = 2
     fin_time = datetime.now() + timedelta(seconds=sec_to_run)
     while datetime.now() < fin_time:
-        curr_state: TreeNode = root
+        if LAZY_EXPANSION and BATCH_ROLLOUTS and HAVE_NUMPY:
+            counter += rollout_batch(tree, self_colour, ROLLOUT_BATCH)
+            continue
+
+        if LAZY_EXPANSION:
+            curr_state, curr_board = select_lazy(tree)
+            tree.backpropagation(curr_state, rollout(curr_board, self_colour))
+            counter += 1
+            continue
+
+        curr_state = ROOT
+        # only the root board is kept, replay the moves down to the leaf
+        curr_board = copy_board(tree.root_board)
         # find leaf node
-        while not curr_state.is_leaf():
-            # calculate UCB1 value of all children
-            max_ucb1 = max([child.UCB1() for child in curr_state.children])
-            curr_state = random.choice(
-                [child for child in curr_state.children if child.UCB1() == max_ucb1])
-            # curr_state = max(curr_state.children, key=lambda x: x.UCB1())
-            # print("curr state board:")
-            # print(curr_state.board.render())
-
-            # just pick random child for now
-            # curr_state = random.choice([child for child in curr_state.children])
-        # print("curr state is now a leaf --------------------------------------")
-        if curr_state.times_visited == 0:
+        while not tree.is_leaf(curr_state):
+            # child with the max UCB1 value, ties broken at random
+            curr_state = tree.select_child(curr_state)
+            curr_board.apply_action(tree.action(curr_state))
+
+        if tree.visits[curr_state] == 0:
             # the node has NOT been visited before in previous rollouts
-            curr_state.wins = rollout(curr_state.board, self_colour)
-            curr_state.backpropagation()
+            tree.backpropagation(curr_state, rollout(curr_board, self_colour))
             counter += 1
-            # print("counter at if curr_state._times_visited == 0: ", counter)
         else:
             # the node has been visited before i.e. in previous rollouts
-            actions = curr_state.board.generate_all_moves()
+            actions = curr_board.generate_all_moves()
             if len(actions) == 0:
                 # debugging here: runs if curr state is a terminal state?
                 continue
-            for action in actions:
-                # make each action into a new TreeNode
-                child = Board(curr_state.board.red_cells.copy(), curr_state.board.blue_cells.copy(),
-                              curr_state.board.turn_color, action, curr_state.board.turn_count)
-                child.apply_action(action)
-
-                child_node = TreeNode(child)
-                curr_state.add_child(child_node)
-                # print(child_node.parent)        # for testing purposes
-            try:
-                rand_child: TreeNode = random.choice(curr_state.children)
-                rand_child.wins = rollout(rand_child.board, self_colour)
-                rand_child.backpropagation()
-                # print(rand_child.board.render())
-                # print("times visited in else:", curr_state.times_visited)
-                counter += 1
-            except:
-                print(curr_state.board.render())
-                print("children: ", curr_state.children)
-            # print("counter at else :", counter)
+            children = tree.expand(curr_state, actions)
+
+            rand_child = random.choice(children)
+            curr_board.apply_action(tree.action(rand_child))
+            tree.backpropagation(rand_child, rollout(curr_board, self_colour))
+            counter += 1
 
     # return the direct child of root with the most wins
-    final_node: TreeNode = max(root.children, key=lambda x: x.wins)
-    return final_node.board.last_piece
+    final_node = max(tree.children(ROOT), key=lambda x: tree.wins[x])
+    return tree.action(final_node)
+
+
+def widening_limit(visits: int) -> int:
+    '''
+    Most children a node visited this many times may have
+    '''
+    return max(1, math.ceil(PW_K * visits ** PW_ALPHA))
+
+
+def select_lazy(tree: Tree) -> tuple[int, Board]:
+    '''
+    Selection and expansion with progressive widening. Descends from the
+    root by UCB1, stopping at the first node that has not been visited yet,
+    or that may have another child under widening_limit, in which case one
+    untried move is added as a new child. The board of a node is only built
+    when the descent reaches it.
+
+    Returns the node to roll out and its board.
+    '''
+    curr_state = ROOT
+    curr_board = copy_board(tree.root_board)
+    while curr_state == ROOT or tree.visits[curr_state] > 0:
+        untried = tree.untried_moves(curr_state, curr_board)
+        if untried and tree.child_count[curr_state] < widening_limit(tree.visits[curr_state]):
+            curr_state = tree.add_child(curr_state, untried.pop())
+            curr_board.apply_action(tree.action(curr_state))
+            break
+
+        if tree.is_leaf(curr_state):
+            # no moves left, i.e. a terminal state
+            break
+        curr_state = tree.select_child(curr_state)
+        curr_board.apply_action(tree.action(curr_state))
+
+    return curr_state, curr_board
 
 
 def rollout(board: Board, self_colour: PlayerColor) -> int:
@@ -187,23 +231,42 @@ def rollout(board: Board, self_colour: PlayerColor) -> int:
         action = choose random action out of all possible actions
         state = simulate(action, state) i.e. apply action, update state & look again
         # remember to flip player colours 
+    played on bitmasks by rollout.play_out, the board is not changed
     '''
-    temp_board = Board(board.red_cells.copy(), board.blue_cells.copy(),
-                       board.turn_color, board.last_piece, board.turn_count)
-    while not temp_board.game_over:
-        # print("rollout while entered")
-        # print("turncount = ", temp_board.turn_count, " turncolor = ", temp_board._turn_color)
-        # print(temp_board.render())
-        # print(temp_board.turn_count)
-        # print(temp_board._turn_color)
-
-        action = temp_board.generate_rand_move()
-        temp_board.apply_action(action)
-
-    winner = temp_board.winner_color
+    winner = play_out(cells_to_mask(board.red_cells), cells_to_mask(board.blue_cells),
+                      board.turn_color, board.turn_count)
     if winner is None:
         return GAME_NOT_WON
     elif winner == self_colour:
         return GAME_WON
     else:
         return GAME_NOT_WON
+
+
+def rollout_batch(tree: Tree, self_colour: PlayerColor, batch: int) -> int:
+    '''
+    Selects batch leaves with select_lazy and plays one rollout from each
+    in lockstep. A leaf's visit is added as soon as it is picked, so the
+    next selections spread over other nodes, and its result once the
+    batch is played.
+
+    Returns the number of rollouts played.
+    '''
+    leaves = []
+    red, blue, red_to_move, turn_count = [], [], [], []
+    for _ in range(batch):
+        curr_state, curr_board = select_lazy(tree)
+        tree.backpropagation(curr_state, 0)
+        leaves.append(curr_state)
+        red.append(cells_to_mask(curr_board.red_cells))
+        blue.append(cells_to_mask(curr_board.blue_cells))
+        red_to_move.append(curr_board.turn_color == PlayerColor.RED)
+        turn_count.append(curr_board.turn_count)
+
+    winners = play_out_batch(cells_from_masks(red), cells_from_masks(blue),
+                             np.array(red_to_move), np.array(turn_count))
+    won = RED_WON if self_colour == PlayerColor.RED else BLUE_WON
+    for leaf, winner in zip(leaves, winners):
+        if winner == won:
+            tree.backpropagation(leaf, GAME_WON, 0)
+    return batch
@@ -0,0 +1,134 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+# Rollouts played on integer bitmasks with the placement table, without
+# building any Coord, PlaceAction or Board during the game.
+
+from referee.game.player import PlayerColor
+from referee.game.constants import *
+from .placements import (CELL_N, FULL_MASK, PLACEMENT_LINES, PLACEMENT_MASKS,
+                         SHIFTS, TYPE_SHIFT_INDEXES, WRAP_COLS, neighbours)
+import random
+
+PLACEMENT_N = len(PLACEMENT_MASKS)
+
+# the steps of translate() for each of SHIFTS
+SHIFT_STEPS = [
+    (dr * BOARD_N, CELL_N - dr * BOARD_N, WRAP_COLS[dc], FULL_MASK & ~WRAP_COLS[dc], dc, BOARD_N - dc)
+    for dr, dc in SHIFTS
+]
+
+# random placements tried before finding every legal one
+SAMPLE_TRIES = 24
+
+
+def random_placement(reach: int, occupied: int) -> int | None:
+    '''
+    A uniformly random placement covering a cell of reach and no occupied
+    cell, or None if there is none.
+
+    Random placements out of the whole table are tried until one is legal,
+    which takes two mask tests each. After SAMPLE_TRIES misses, as when
+    few or no placements are legal, exact_random_placement is used.
+    '''
+    if not reach:
+        return None
+
+    rand = random.random
+    for _ in range(SAMPLE_TRIES):
+        pid = int(rand() * PLACEMENT_N)
+        mask = PLACEMENT_MASKS[pid]
+        if mask & reach and not mask & occupied:
+            return pid
+
+    return exact_random_placement(reach, occupied)
+
+
+def exact_random_placement(reach: int, occupied: int) -> int | None:
+    '''
+    Same as random_placement, by finding every legal placement. For each
+    piece type, the anchor cells where it covers no occupied cell and a
+    cell of reach are found for the whole board at once by moving the
+    masks of free cells and of reach onto the anchor of each of its cells.
+    '''
+    free = FULL_MASK & ~occupied
+    moved_free = []
+    moved_reach = []
+    # translate() inlined, as this is most of the time spent here
+    for up, down, wrap, keep, right, left in SHIFT_STEPS:
+        moved = (free << up | free >> down) & FULL_MASK
+        moved_free.append((moved & keep) << right | (moved & wrap) >> left)
+        moved = (reach << up | reach >> down) & FULL_MASK
+        moved_reach.append((moved & keep) << right | (moved & wrap) >> left)
+
+    anchors = []
+    total = 0
+    for indexes in TYPE_SHIFT_INDEXES:
+        fits = FULL_MASK
+        touches = 0
+        for i in indexes:
+            fits &= moved_free[i]
+            touches |= moved_reach[i]
+        legal = fits & touches
+        anchors.append(legal)
+        total += legal.bit_count()
+
+    # no legal placement at all, known without trying any
+    if total == 0:
+        return None
+
+    index = int(random.random() * total)
+    for type_index, legal in enumerate(anchors):
+        count = legal.bit_count()
+        if index >= count:
+            index -= count
+            continue
+        for _ in range(index):
+            legal &= legal - 1
+        return type_index * CELL_N + (legal & -legal).bit_length() - 1
+
+
+def play_out(red: int, blue: int, turn_color: PlayerColor, turn_count: int) -> PlayerColor | None:
+    '''
+    Play uniformly random legal placements from the given position until
+    the game ends.
+
+    Returns the winner, or None for a draw.
+    '''
+    red_to_move = turn_color == PlayerColor.RED
+
+    while turn_count < MAX_TURNS:
+        occupied = red | blue
+        if turn_count < 2:
+            # the first piece of each player may go anywhere free
+            reach = FULL_MASK & ~occupied
+        else:
+            reach = neighbours(red if red_to_move else blue) & ~occupied
+
+        pid = random_placement(reach, occupied)
+        if pid is None:
+            # no piece can be placed, the opponent wins
+            return PlayerColor.BLUE if red_to_move else PlayerColor.RED
+
+        mask = PLACEMENT_MASKS[pid]
+        occupied |= mask
+        cleared = 0
+        for line in PLACEMENT_LINES[pid]:
+            if occupied & line == line:
+                cleared |= line
+
+        if red_to_move:
+            red |= mask
+        else:
+            blue |= mask
+        if cleared:
+            red &= ~cleared
+            blue &= ~cleared
+
+        red_to_move = not red_to_move
+        turn_count += 1
+
+    balance = red.bit_count() - blue.bit_count()
+    if balance == 0:
+        return None
+    return PlayerColor.RED if balance > 0 else PlayerColor.BLUE
@@ -1,86 +1,191 @@
 from referee.game.constants import *
 from .board import Board
+from .placements import PLACEMENT_ACTIONS, cells_to_mask, legal_placement_ids, placement_id
+from referee.game.player import PlayerColor
+from array import array
 import math
+import random
 
 UCB1_C = 1      # constant for balancing exploration & exploitation in UCB1
 
-class TreeNode:
+ROOT = 0        # index of the root node
+NO_NODE = -1    # parent of the root, first child / next sibling of none
+NO_MOVE = -1    # move id of the root
+
+
+class Tree:
 
     '''
-    Inspiration from: https://gist.github.com/kernelshreyak/d209a694ea5b4c312ab601f4dd6d7aa4
+    Monte Carlo search tree stored as parallel arrays indexed by node, with
+    node ROOT as the root. The children of a node form a linked list, from
+    first_child[node] through next_sibling, so that children can be added
+    one at a time.
+
+    Nodes hold no board, only the id of the move leading to them (see
+    placements.py), so a node's board is rebuilt by replaying the moves
+    from the root board.
     '''
 
-    def __init__(
-        self,
-        board: Board = Board(),
-        parent: 'TreeNode' = None,
-        children: list['TreeNode'] = None,
-        wins: int = 0,
-        times_visited: int = 0,
-    ):
-        self.board = board
-        self.parent = parent
-        self.children = []
-        self._wins = wins
-        self._times_visited = times_visited
-
-        if children is not None:
-            for child in children:
-                self.add_child(child)
-    
-    def is_root(self):
-        if self.parent is None:
-            return True
-        return False
-
-    def is_leaf(self):
-        if len(self.children) == 0:
-            return True
-        return False
-
-    def add_child(self, child: 'TreeNode'):
-        child.parent = self
-        self.children.append(child)
-
-    @property
-    def wins(self):
-        '''
-        getter for wins (used in UCB1)
-        '''
-        return self._wins
-    
-    @wins.setter
-    def wins(self, value):
-        self._wins = value
-
-    @property
-    def times_visited(self):
-        return self._times_visited
-    
-    @times_visited.setter
-    def times_visited(self, value):
-        self._times_visited = value
-
-    def UCB1(self) -> float:
-        '''
-        Calculate UCB1 value for this node
-        '''
-        try:
-            ucb1 = ((self.wins/self.times_visited) + 
-                    UCB1_C*math.sqrt(math.log(self.parent.times_visited)/self.times_visited))
-        except ZeroDivisionError:
+    def __init__(self, board: Board):
+        self.root_board = copy_board(board)
+
+        self.visits = array('i', [0])
+        self.wins = array('i', [0])
+        self.parent = array('i', [NO_NODE])
+        self.first_child = array('i', [NO_NODE])
+        self.next_sibling = array('i', [NO_NODE])
+        self.child_count = array('i', [0])
+        self.move = array('h', [NO_MOVE])
+
+        # node -> ids of the moves not yet added as children, for nodes
+        # expanded one child at a time
+        self.untried: dict[int, array] = {}
+
+    def __len__(self):
+        return len(self.visits)
+
+    def is_leaf(self, node: int) -> bool:
+        return self.child_count[node] == 0
+
+    def children(self, node: int) -> list[int]:
+        children = []
+        child = self.first_child[node]
+        while child != NO_NODE:
+            children.append(child)
+            child = self.next_sibling[child]
+        return children
+
+    def add_child(self, node: int, move: int) -> int:
+        '''
+        Add a child to node for the move with the given id, returns the child
+        '''
+        child = len(self.visits)
+        self.visits.append(0)
+        self.wins.append(0)
+        self.parent.append(node)
+        self.first_child.append(NO_NODE)
+        self.next_sibling.append(self.first_child[node])
+        self.child_count.append(0)
+        self.move.append(move)
+
+        self.first_child[node] = child
+        self.child_count[node] += 1
+        return child
+
+    def expand(self, node: int, actions) -> list[int]:
+        '''
+        Add a child to node for each action, returns the new children
+        '''
+        return [self.add_child(node, placement_id(action)) for action in actions]
+
+    def untried_moves(self, node: int, board: Board) -> array:
+        '''
+        Ids of the moves from node not yet added as children, in random
+        order, where board is the board at node. The moves are only
+        generated on the first call for a node.
+        '''
+        untried = self.untried.get(node)
+        if untried is None:
+            if board.turn_count < 2:
+                moves = [placement_id(action) for action in board.generate_all_moves()]
+            else:
+                red = cells_to_mask(board.red_cells)
+                blue = cells_to_mask(board.blue_cells)
+                my_cells = red if board.turn_color == PlayerColor.RED else blue
+                moves = legal_placement_ids(my_cells, red | blue)
+            random.shuffle(moves)
+            untried = self.untried[node] = array('h', moves)
+        return untried
+
+    def action(self, node: int):
+        '''
+        The PlaceAction leading to node
+        '''
+        return PLACEMENT_ACTIONS[self.move[node]]
+
+    def UCB1(self, node: int) -> float:
+        '''
+        Calculate UCB1 value for a node
+        '''
+        visits = self.visits[node]
+        if visits == 0:
             return math.inf
-        # print("wins, visited, ucb1:", self.wins, self.times_visited, ucb1)
-        return ucb1
+        return (self.wins[node] / visits +
+                UCB1_C * math.sqrt(math.log(self.visits[self.parent[node]]) / visits))
+
+    def select_child(self, node: int) -> int:
+        '''
+        The child of node with the highest UCB1 value, ties broken at random
+        '''
+        children = self.children(node)
+        ucb1 = [self.UCB1(child) for child in children]
+        max_ucb1 = max(ucb1)
+        return random.choice(
+            [child for child, value in zip(children, ucb1) if value == max_ucb1])
+
+    def backpropagation(self, node: int, result: int, visits: int = 1):
+        '''
+        After rollout, add its result to node and every node up to root.
+        Batched rollouts add the visit when the node is picked and the
+        result, with visits=0, once the batch is played
+        '''
+        while node != NO_NODE:
+            self.visits[node] += visits
+            self.wins[node] += result
+            node = self.parent[node]
+
+    def find_child(self, node: int, action) -> int:
+        '''
+        The child of node reached by action, or NO_NODE if it has not been
+        added to the tree
+        '''
+        move = placement_id(action)
+        for child in self.children(node):
+            if self.move[child] == move:
+                return child
+        return NO_NODE
 
-    def backpropagation(self):
+    def subtree(self, node: int) -> 'Tree':
         '''
-        After rollout, back propagate the values up to root
+        A new tree holding node and everything below it, with node as its
+        root
         '''
-        self._times_visited += 1
-        curr_node = self
-        while not curr_node.is_root():
-            curr_node.parent._times_visited += 1
-            curr_node.parent._wins += curr_node.wins
-            curr_node = curr_node.parent
-        # print("root times visited:", curr_node.times_visited)
\ No newline at end of file
+        tree = Tree(self.board(node))
+        tree.visits[ROOT] = self.visits[node]
+        tree.wins[ROOT] = self.wins[node]
+
+        # (node in this tree, the same node in the new tree)
+        queue = [(node, ROOT)]
+        for old, new in queue:
+            if old in self.untried:
+                tree.untried[new] = self.untried[old]
+
+            # added in reverse so the children keep their order
+            for child in reversed(self.children(old)):
+                copy = tree.add_child(new, self.move[child])
+                tree.visits[copy] = self.visits[child]
+                tree.wins[copy] = self.wins[child]
+                queue.append((child, copy))
+        return tree
+
+    def board(self, node: int) -> Board:
+        '''
+        Rebuild the board at node by replaying moves from the root board
+        '''
+        path = []
+        while node != ROOT:
+            path.append(node)
+            node = self.parent[node]
+
+        board = copy_board(self.root_board)
+        for node in reversed(path):
+            board.apply_action(self.action(node))
+        return board
+
+
+def copy_board(board: Board) -> Board:
+    '''
+    A copy of board that can be changed without changing board
+    '''
+    return Board(board.red_cells.copy(), board.blue_cells.copy(),
+                 board.turn_color, board.last_piece, board.turn_count)
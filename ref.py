@@ -1,6 +1,5 @@
 from referee.game import PlayerColor, Action, PlaceAction, coord
 from monte.board import Board
-from monte.tree import TreeNode
 import random
 import math
 import copy
@@ -0,0 +1,113 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+# Property test of the eval terms Board and BitBoard keep up to date by
+# delta (balance and bad_lines), against a full rescan after every
+# apply_action and undo_action over random games.
+
+import random
+
+import pytest
+
+from referee.game import PlayerColor
+from referee.game.constants import BOARD_N, MAX_TURNS
+from agent.board import Board, BAD_LINE
+from agent.bitboard import BitBoard, bad_line_count
+from agent.placements import cells_to_mask, placement_id
+from agent.program import MATERIAL_WEIGHT, MOBILITY_WEIGHT, WINNING_SCORE, eval
+
+# random games played on each kind of board
+GAMES = 20
+
+# chance of playing a line-clearing move when there is one, so that most
+# games clear lines
+CLEAR_CHANCE = 0.5
+
+
+def rescan(board: Board | BitBoard) -> tuple[int, list[int]]:
+    """
+    The balance and bad line counts of a board, recomputed from its cells.
+    """
+
+    red = cells_to_mask(board.red_cells)
+    blue = cells_to_mask(board.blue_cells)
+    return (red.bit_count() - blue.bit_count(),
+            [bad_line_count(red), bad_line_count(blue)])
+
+
+def old_eval(board: Board | BitBoard) -> int:
+    """
+    The eval as computed before its terms were kept on the board, scanning
+    every row and column of the cells.
+    """
+
+    winner = board.winner_color
+    if winner == PlayerColor.RED:
+        return WINNING_SCORE
+    if winner == PlayerColor.BLUE:
+        return -WINNING_SCORE
+
+    red_cells = board.red_cells
+    blue_cells = board.blue_cells
+
+    bad_red_lines = 0
+    bad_blue_lines = 0
+    for i in range(BOARD_N):
+        for line in (lambda cell: cell.r == i, lambda cell: cell.c == i):
+            if sum(map(line, red_cells)) >= BAD_LINE:
+                bad_red_lines += 1
+            if sum(map(line, blue_cells)) >= BAD_LINE:
+                bad_blue_lines += 1
+
+    material = len(red_cells) - len(blue_cells) - (bad_red_lines - bad_blue_lines)
+    red_reach, blue_reach = board.frontier_sizes()
+    return MATERIAL_WEIGHT * material + MOBILITY_WEIGHT * (red_reach - blue_reach)
+
+
+def check(board: Board | BitBoard):
+    balance, bad_lines = rescan(board)
+    assert board.balance == balance
+    assert list(board.bad_lines) == bad_lines
+    assert eval(board) == old_eval(board)
+
+
+def pick_move(board: Board | BitBoard, rng: random.Random):
+    moves = sorted(board.generate_all_moves(), key=placement_id)
+    clearing = [move for move in moves if board.line_clear_gain(move) > 0]
+    if clearing and rng.random() < CLEAR_CHANCE:
+        return rng.choice(clearing)
+    return rng.choice(moves)
+
+
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+def test_incremental_eval_matches_rescan(board_class):
+    rng = random.Random(30024)
+    clears = 0
+
+    for _ in range(GAMES):
+        board = board_class()
+        records = []
+        check(board)
+
+        while not board.game_over and board.turn_count < MAX_TURNS:
+            move = pick_move(board, rng)
+            tokens = len(board.red_cells) + len(board.blue_cells)
+            record = board.apply_action(move)
+            check(board)
+            if len(board.red_cells) + len(board.blue_cells) < tokens + 4:
+                clears += 1
+
+            # undo then redo the move, checking both
+            board.undo_action(record)
+            check(board)
+            records.append(board.apply_action(move))
+            check(board)
+
+        # unwind the whole game back to the empty board
+        for record in reversed(records):
+            board.undo_action(record)
+            check(board)
+        assert not board.red_cells and not board.blue_cells
+
+    # the games must have exercised line clears
+    assert clears > GAMES